@@ -1,11 +1,28 @@
-from definitions import Input, Operation
-import argparse
+from lru import LRUCache
+from tables import INPUT_BOUNDS, ENCODE, BITWISE_CMPS
+
+# the enums in definitions.py are the source of truth, tables.py is generated from them by build_tables.py so that
+# startup doesn't pay for building them (argparse is likewise only imported when running as a script)
 
 # guide for my custom assembly language: bit.ly/nra2130Assembly101
 
-errors = [] # list of string descriptions of errors that occurred during the assembly process
+REASONS = { # error code: reason it's printed with
+    "no-operation": "no operation",
+    "invalid-operation": "invalid operation",
+    "input-amount": "wrong amount of inputs",
+    "invalid-register-address": "invalid register address",
+    "invalid-number": "invalid number",
+    "invalid-line-number": "invalid line number",
+    "invalid-ram-address": "invalid ram address",
+    "invalid-bitwise-operation": "invalid bitwise operation",
+}
+
+def within_bounds(input_type: str, value: int) -> bool:
+    """Check if a value is within the input kind's bounds."""
+    min_, max_ = INPUT_BOUNDS[input_type]
+    return min_ <= value < max_
 
-def check_address(address: str, address_type: Input) -> bool:
+def check_address(address: str, address_type: str) -> bool:
     """Check if the inputted address is a valid register, ram address, or line number (to jump to)."""
     if not address[:2] == address_type:
         return False
@@ -15,7 +32,7 @@ def check_address(address: str, address_type: Input) -> bool:
     except ValueError:
         return False
 
-    return address_type.within_bounds(val)
+    return within_bounds(address_type, val)
 
 def check_integer(number: str) -> bool:
     """Check if the inputted number is a valid integer immediate."""
@@ -23,19 +40,115 @@ def check_integer(number: str) -> bool:
         val = int(number)
     except ValueError:
         return False
-    return Input.INTGR.within_bounds(val)
+    return within_bounds("intgr", val)
+
+class AssemblyAborted(Exception):
+    """Raised once a Diagnostics collector found as many errors as it was told to abort after."""
+
+
+class Diagnostic:
+    """An error found while assembling, kept compact since huge generated inputs can have millions of them."""
+
+    __slots__ = ("line", "column", "code", "operand", "actual", "expected")
+
+    def __init__(self, line: int, column: int, code: str, operand: str | None, actual: int | None = None, expected: int | None = None):
+        self.line = line          # line number, starting at 1
+        self.column = column      # column of the invalid token, starting at 1
+        self.code = code          # one of REASONS
+        self.operand = operand    # the invalid token, None for input-amount (the line as a whole is at fault)
+        self.actual = actual      # amount of inputs the line has, only for input-amount
+        self.expected = expected  # amount of inputs its operation takes, only for input-amount
+
+    def reason(self) -> str:
+        """Why the line is invalid, without the line number."""
+        if self.code == "input-amount":
+            actl_amnt, expct_amnt = self.actual, self.expected
+            # this looks ugly because I wanted the pluralization to be correct
+            return (f"there {'was' if actl_amnt == 1 else 'were'} {actl_amnt} input{'' if actl_amnt == 1 else 's'}, "
+                f"but {expct_amnt} {'was' if expct_amnt == 1 else 'were'} expected.")
+        return f"'{self.operand}' is invalid. Specified reason: {REASONS[self.code]}."
+
+    def message(self) -> str:
+        return f"Line #{self.line} is invalid, because {self.reason()}"
+
+    def record(self) -> dict:
+        record = {"line": self.line, "column": self.column, "code": self.code, "operand": self.operand}
+        if self.code == "input-amount":
+            record["actual"] = self.actual
+            record["expected"] = self.expected
+        return record
+
+
+class Diagnostics:
+    """Collects the errors of an assembly run, keeping at most max_kept of them but counting all of them per error code.
+    
+    Errors are written to stream as JSON lines as soon as they're found, and the run is aborted with AssemblyAborted once
+    abort_after errors were found.
+    """
 
-def error(input: Operation | str, line_num: int, reason = "none") -> str:
-    """Generic error message creator for invalid operations."""
-    errors.append(f"Line #{line_num} is invalid, because '{input}' is invalid. Specified reason: {reason}.")
-    return "ERROR"
+    def __init__(self, max_kept: int = 1000, abort_after: int | None = None, stream = None):
+        self.max_kept = max_kept
+        self.abort_after = abort_after
+        self.stream = stream # file like object to write JSON lines to, if any
+        self.kept: list[Diagnostic] = []
+        self.counts: dict[str, int] = {} # error code: amount found
+        self.total = 0
+        if stream is not None:
+            import json # only needed when streaming, importing it always would slow down startup
+            self.encode = json.JSONEncoder(separators=(",", ":")).encode
 
-def input_amount_error(line_num: int, expct_amnt: int, actl_amnt: int) -> str:
-    """Specialized error message creator for an operation with too many or too few inputs."""
-    # this looks ugly because I wanted the pluralization to be correct
-    errors.append(f"Line #{line_num} is invalid, because there {'was' if actl_amnt == 1 else 'were'} {actl_amnt} input"
-        f"{'' if actl_amnt == 1 else 's'}, but {expct_amnt} {'was' if expct_amnt == 1 else 'were'} expected.")
-    return "ERROR"
+    def report(self, diagnostic: Diagnostic) -> None:
+        self.total += 1
+        self.counts[diagnostic.code] = self.counts.get(diagnostic.code, 0) + 1
+        if len(self.kept) < self.max_kept:
+            self.kept.append(diagnostic)
+        if self.stream is not None:
+            self.stream.write(self.encode(diagnostic.record()) + "\n")
+        if self.abort_after is not None and self.total >= self.abort_after:
+            raise AssemblyAborted(f"Assembly aborted after {self.total} errors.")
+
+    def messages(self) -> list[str]:
+        messages = [diagnostic.message() for diagnostic in self.kept]
+        if self.total > len(self.kept):
+            counts = ", ".join(f"{count} {code}" for code, count in sorted(self.counts.items(), key=lambda item: -item[1]))
+            messages.append(f"... and {self.total - len(self.kept)} more errors ({self.total} in total: {counts}).")
+        return messages
+
+    def clear(self) -> None:
+        self.kept.clear()
+        self.counts.clear()
+        self.total = 0
+
+    def __bool__(self) -> bool:
+        return self.total > 0
+
+errors = Diagnostics() # the errors that occurred during the assembly process
+
+def token_columns(line: str) -> list[int]:
+    """The column (starting at 1) of every token line.split() would split the line into."""
+    columns = []
+    after_space = True
+    for column, char in enumerate(line, 1):
+        if after_space and not char.isspace():
+            columns.append(column)
+        after_space = char.isspace()
+    return columns
+
+def locate(line: str, line_num: int, problems: tuple[tuple[str, int, str], ...]) -> list[Diagnostic]:
+    """Turn the problems assemble_line found in a line into diagnostics, with the column of the token each one is about."""
+    if not problems:
+        return []
+    # comments only come after the assembled tokens, so a token's index in the normalized line is its index in the line
+    columns = token_columns(line)
+    diagnostics = []
+    for code, index, operand in problems:
+        column = columns[index] if columns else 1
+        if code == "input-amount":
+            tokens = normalize(line).split()
+            diagnostics.append(Diagnostic(line_num, column, code, None, len(tokens) - 1, len(ENCODE[tokens[0]][1])))
+        else:
+            diagnostics.append(Diagnostic(line_num, column, code, operand))
+    return diagnostics
 
 
 # some test cases for the different aseembly operations
@@ -70,99 +183,189 @@ test_cases = {
     "_not_ rg5 rg4 rg3": "ERROR",          # too many inputs
     "_nat_ rg5 rg4": "ERROR",              # invalid operation
     "_rms_ rm256 rg15": "ERROR",           # too large of a RAM address
+    "# just a comment": "ERROR",           # comments only come after an operation
 }
 
-parser = argparse.ArgumentParser(description='Assemble your assembly code into binary!')
-parser.add_argument('-t','--test', help='run the test cases instead of assembling user input', required=False, action='store_true')
-parser.add_argument('-i','--input', help='input text file to read multiple lines of assembly code', required=False)
-parser.add_argument('-o','--output', help='output text file to write the multiple lines of assembled code to (default is output.txt)', required=False, default='output.txt')
-args = vars(parser.parse_args())
+# the diagnostics some invalid lines should get: line: [(column, error code, operand)]
+
+diagnostic_cases = {
+    "_rld_ rm1 rm1": [(11, "invalid-register-address", "rm1")],  # the first rm1 is a valid RAM address
+    "_rrd_ rg1 rg": [(11, "invalid-register-address", "rg")],    # rg is part of the valid rg1
+    "_add_ rg16 rg1 rg16": [(7, "invalid-register-address", "rg16"), (16, "invalid-register-address", "rg16")],
+    "  _sub_ rg1  rg2 # rg3": [(3, "input-amount", None)],
+    "_cjp_ ln0 rg1 rg1 _and_ # _and_": [(19, "invalid-bitwise-operation", "_and_")],
+    "\t_nat_ rg1": [(2, "invalid-operation", "_nat_")],
+    "   ": [(1, "no-operation", "")],
+}
+
+def check_diagnostics() -> list[str]:
+    """Check the diagnostics of diagnostic_cases and how Diagnostics keeps, counts, streams and aborts, returns the failures."""
+    import io
+    global errors
+
+    failures = []
+    for line, expected in diagnostic_cases.items():
+        actual = [(diagnostic.column, diagnostic.code, diagnostic.operand) for diagnostic in locate(line, 1, assemble_line(line)[1])]
+        if actual != expected:
+            failures.append(f"{line!r} got diagnostics {actual}, expected {expected}")
+    amounts = locate("_sub_ rg1", 1, assemble_line("_sub_ rg1")[1])[0]
+    if (amounts.actual, amounts.expected) != (1, 3) or "there was 1 input, but 3 were expected." not in amounts.message():
+        failures.append(f"'_sub_ rg1' got {amounts.record()}, expected 1 of 3 inputs")
+
+    kept_errors = errors
+    stream = io.StringIO()
+    errors = Diagnostics(max_kept=2, abort_after=5, stream=stream)
+    try:
+        assemble(["_nat_", "_rcl_", "_sub_", "_rld_ rm1 rm1", "_nat_"] + ["_nat_"] * 10)
+        failures.append("assembling didn't abort after 5 errors")
+    except AssemblyAborted:
+        pass
+    finally:
+        collected, errors = errors, kept_errors
+    if collected.total != 5 or len(collected.kept) != 2 or collected.counts != {"invalid-operation": 3, "input-amount": 1, "invalid-register-address": 1}:
+        failures.append(f"kept {len(collected.kept)} of {collected.total} errors counted as {collected.counts}, expected 2 of 5")
+    if len(collected.messages()) != 3 or not collected.messages()[-1].startswith("... and 3 more errors (5 in total:"):
+        failures.append(f"messages ended with {collected.messages()[-1]!r}, expected a summary of the 3 errors that weren't kept")
+    records = stream.getvalue().splitlines()
+    if len(records) != 5 or records[2] != '{"line":4,"column":11,"code":"invalid-register-address","operand":"rm1"}':
+        failures.append(f"streamed {records}, expected 5 JSON lines")
+    return failures
+
+def normalize(line: str) -> str:
+    """The part of a line that matters for assembling it: its operation and inputs, single spaced and without comments."""
+    inputs = line.split()
+    # comments start after the operation, so a line starting with one has an invalid operation (like "#foo")
+    for i, input in enumerate(inputs[1:], 1):
+        if input[0] == "#":
+            inputs = inputs[:i]
+            break
+    return " ".join(inputs)
+
+def assemble_line(line: str) -> tuple[str, tuple[tuple[str, int, str], ...]]:
+    """Assemble a single line of assembly code, returns its hexadecimal machine code ("ERROR" if invalid) and its problems.
+    
+    A problem is an (error code, index of the invalid token, the token) triple, the operation being token 0. They don't
+    depend on the line number so the result can be reused wherever the line appears (see locate and language_server.py).
+    """
+    # programs repeat the same instructions a lot, so each distinct instruction is only validated once
+    return assemble_cache(normalize(line))
+
+def _assemble_normalized(line: str) -> tuple[str, tuple[tuple[str, int, str], ...]]:
+    """Assemble a normalized line, see assemble_line."""
+    problems = []
+    def invalid(input: str, code: str, index: int = 0) -> str:
+        problems.append((code, index, input))
+        return "ERROR"
+
+    inputs = line.split()
+
+    try:
+        operation = inputs.pop(0)
+    except IndexError:
+        return invalid("", "no-operation"), tuple(problems)
+
+    try:
+        binary, input_types = ENCODE[operation]
+    except KeyError:
+        return invalid(operation, "invalid-operation"), tuple(problems)
+
+    expctd_amnt = len(input_types)
+    actl_amnt = len(inputs)
+    if actl_amnt != expctd_amnt:
+        return invalid(operation, "input-amount"), tuple(problems) # locate counts the inputs again for the diagnostic
+    # check the validity of the inputs depending on the operation
+    for i, (input, input_type) in enumerate(zip(inputs, input_types), 1):
+        if input_type == "rg":
+            binary += f'{int(input[2:]):04b}' if check_address(input, "rg") else invalid(input, "invalid-register-address", i)
+        elif input_type == "intgr":
+            # https://stackoverflow.com/questions/63274885/converting-an-integer-to-signed-2s-complement-binary-string
+            # bitmask to grab the last 16 bits of the integer
+            binary += f'{int(input) & ((1 << 16) - 1):016b}' if check_integer(input) else invalid(input, "invalid-number", i)
+        elif input_type == "ln":
+            binary += f'{int(input[2:]):016b}' if check_address(input, "ln") else invalid(input, "invalid-line-number", i)
+        elif input_type == "rm":
+            binary += f'{int(input[2:]):08b}' if check_address(input, "rm") else invalid(input, "invalid-ram-address", i)
+        elif input_type == "btwse":
+            # only the comparison operations can be used for conditional jumps
+            binary += BITWISE_CMPS[input] if input in BITWISE_CMPS else invalid(input, "invalid-bitwise-operation", i)
+
+    if problems:
+        return "ERROR", tuple(problems)
+
+    # length of binary code should be 32, we need to add zero padding if it's not
+    padding = 32 - len(binary)
+    binary += "0"*padding
+    return hex(int(binary, 2)), ()
+
+assemble_cache = LRUCache(_assemble_normalized, 4096) # normalized line: (machine code, problems)
+
+def assemble(assembly_code) -> list[str]:
+    """Assemble lines of assembly code (any iterable, like an open file) into hexadecimal machine code ("ERROR" for invalid lines, see errors)."""
+    assembled_code = [] # the final assembled code, each element is a line of machine code (as a hex string)
+
+    for line_num, line in enumerate(assembly_code, 1):
+        code, problems = assemble_line(line)
+        if problems:
+            for diagnostic in locate(line, line_num, problems):
+                errors.report(diagnostic)
+        assembled_code.append(code)
+
+    return assembled_code
+
 
 if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='Assemble your assembly code into binary!')
+    parser.add_argument('-t','--test', help='run the test cases instead of assembling user input', required=False, action='store_true')
+    parser.add_argument('-i','--input', help='input text file to read multiple lines of assembly code', required=False)
+    parser.add_argument('-o','--output', help='output text file to write the multiple lines of assembled code to (default is output.txt)', required=False, default='output.txt')
+    parser.add_argument('-c','--cache-size', help='amount of distinct instructions to remember the assembled code of (default is 4096)', required=False, type=int, default=4096)
+    parser.add_argument('-s','--cache-stats', help='print how often the instruction cache was hit', required=False, action='store_true')
+    parser.add_argument('-d','--diagnostics', help='file to stream the errors to as JSON lines while assembling ("-" for stdout)', required=False)
+    parser.add_argument('-m','--max-errors', help='amount of errors to keep and print at the end, the rest are only counted (default is 1000)', required=False, type=int, default=1000)
+    parser.add_argument('-a','--abort-after', help='stop assembling once this many errors were found', required=False, type=int)
+    args = vars(parser.parse_args())
+
     testing = args["test"]
     input_file = args["input"]
     output_file = args["output"]
+    assemble_cache.resize(args["cache_size"])
+    stream = None
+    if args["diagnostics"]:
+        stream = sys.stdout if args["diagnostics"] == "-" else open(args["diagnostics"], "w+")
+    errors = Diagnostics(args["max_errors"], args["abort_after"], stream)
+
     assembly_code = []
     if testing:
         print("Running test cases...")
         assembly_code = list(test_cases)
-    elif input_file:
-        with open(input_file, "r") as f:
-            assembly_code = f.readlines()
-    else:
+    elif not input_file:
         assembly_code = [input("Please enter your line of assembly code: ")]
 
-    assembled_code = [] # the final assembled code, each element is a line of binary code (as a string)
-
-    for line_num, line in enumerate(assembly_code, 1):
-        inputs = line.split()
-
-        try:
-            operation = inputs.pop(0)
-        except IndexError:
-            assembled_code.append("ERROR")
-            error("", line_num, "no operation")
-            continue
-
-        try:
-            operation = Operation(operation)
-        except ValueError:
-            assembled_code.append("ERROR")
-            error(operation, line_num, "invalid operation")
-            continue
-
-        binary = operation.bnry
-        
-        # remove comments
-        for i, input in enumerate(inputs):
-            if input[0] == "#":
-                inputs = inputs[:i]
-                break
-
-        expctd_amnt = len(operation.inputs)
-        actl_amnt = len(inputs)
-        if actl_amnt != expctd_amnt:
-            assembled_code.append("ERROR")
-            input_amount_error(line_num, expctd_amnt, actl_amnt)
-            continue
-        # check the validity of the inputs depending on the operation
-        for input, input_type in zip(inputs, operation.inputs):
-            if input_type == Input.RG:
-                binary += f'{int(input[2:]):04b}' if check_address(input, Input.RG) else error(input, line_num, "invalid register address")
-            elif input_type == Input.INTGR:
-                # https://stackoverflow.com/questions/63274885/converting-an-integer-to-signed-2s-complement-binary-string
-                # bitmask to grab the last 16 bits of the integer
-                binary += f'{int(input) & ((1 << 16) - 1):016b}' if check_integer(input) else error(input, line_num, "invalid number")
-            elif input_type == Input.LN:
-                binary += f'{int(input[2:]):016b}' if check_address(input, Input.LN) else error(input, line_num, "invalid line number")
-            elif input_type == Input.RM:
-                binary += f'{int(input[2:]):08b}' if check_address(input, Input.RM) else error(input, line_num, "invalid ram address")
-            elif input_type == Input.BTWSE:
-                try:
-                    input = Operation(input) # this may throw a ValueError
-                    if input not in input.bitwise_cmps():
-                        raise ValueError
-                    binary += input.bnry
-                except ValueError:
-                    binary += error(input, line_num, "invalid bitwise operation")
-
-
-        # length of binary code should be 32, we need to add zero padding if it's not
-        padding = 32 - len(binary)
-        binary += "0"*padding
-
-        if "ERROR" not in binary:
-            if not testing:
-                assembled_code.append(hex(int(binary, 2)))
-            else:
-                assembled_code.append("VALUE")
+    try:
+        if input_file:
+            with open(input_file, "r") as f:
+                assembled_code = assemble(f) # streamed, the whole input never has to be in memory at once
         else:
-            assembled_code.append("ERROR")
+            assembled_code = assemble(assembly_code)
+    except AssemblyAborted as e:
+        print('\n'+'\n'.join(errors.messages()) + f"\n\n{e}")
+        sys.exit(1)
+    finally:
+        if stream is not None and stream is not sys.stdout:
+            stream.close()
+
+    if testing:
+        assembled_code = [code if code == "ERROR" else "VALUE" for code in assembled_code]
 
     if errors:
-        print('\n'+'\n'.join(errors))
+        print('\n'+'\n'.join(errors.messages()))
     if not testing:
         print("\nOutput:\n" + '\n'.join(assembled_code))
+    if args["cache_stats"]:
+        print(f"\nInstruction cache: {assemble_cache.stats()}")
 
     if input_file:
         with open(output_file, "w+") as output:
@@ -177,10 +380,13 @@ if __name__ == "__main__":
 
     if testing:
         expected_array = list(test_cases.values())
-        if expected_array == assembled_code:
+        failures = check_diagnostics()
+        if expected_array == assembled_code and not failures:
             print("\nTest Results: Assembler working properly 😊")
         else:
             for i, (line, expected, actual) in enumerate(zip(assembly_code, expected_array, assembled_code)):
                 if expected != actual:
                     print(f"Failed case #{i}: {line}")
+            for failure in failures:
+                print(f"Failed diagnostics case: {failure}")
             print("\nTest Results: Assembler working improperly 🫠")
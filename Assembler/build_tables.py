@@ -0,0 +1,80 @@
+from definitions import Input, Operation
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# assembler.py and disassembler.py only need plain lookup tables, building the multi-value StrEnums at every startup
+# costs more than translating a typical program, so the tables are generated once from definitions.py and checked in
+
+TABLES_PATH = Path(__file__).with_name("tables.py")
+
+IMPORT_BUDGETS = { # cumulative -X importtime budget of each CLI module (microseconds), including everything it imports
+    "assembler": 1000,
+    "disassembler": 1000,
+}
+
+FORBIDDEN_IMPORTS = ["enum", "argparse", "definitions"] # modules the CLIs must not import just to start up
+
+def render_tables() -> str:
+    """Render the source code of tables.py from the enums in definitions.py."""
+    bounds = {input_type._value_: (input_type.min_, input_type.max_) for input_type in Input}
+    encode = {op._value_: (op.bnry, tuple(input_type._value_ for input_type in op.inputs)) for op in Operation}
+    decode = {op.bnry: (op._value_, tuple(input_type._value_ for input_type in op.inputs)) for op in Operation}
+    bitwise_cmps = {op._value_: op.bnry for op in Operation.bitwise_cmps()}
+    return (
+        "# generated by build_tables.py from definitions.py, do not edit by hand\n\n"
+        f"INPUT_BOUNDS = {bounds!r}  # input kind: (min inclusive, max exclusive)\n\n"
+        f"ENCODE = {encode!r}  # operation: (binary opcode, input kinds)\n\n"
+        f"DECODE = {decode!r}  # binary opcode: (operation, input kinds)\n\n"
+        f"BITWISE_CMPS = {bitwise_cmps!r}  # comparisons usable by conditional jumps: binary opcode\n"
+    )
+
+def import_profile(module: str) -> dict[str, int]:
+    """Import a module in a fresh interpreter and return the cumulative import time (microseconds) of every module it loaded."""
+    # measure with bytecode caching on, since that is how the CLIs normally run
+    env = {key: val for key, val in os.environ.items() if key != "PYTHONDONTWRITEBYTECODE"}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=TABLES_PATH.parent, env=env, capture_output=True, text=True, check=True)
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        profile[name.strip()] = int(cumulative)
+    return profile
+
+def check() -> list[str]:
+    """Check that tables.py is up to date and that the CLIs stay within their startup budgets."""
+    problems = []
+    if not TABLES_PATH.exists() or TABLES_PATH.read_text() != render_tables():
+        problems.append(f"{TABLES_PATH.name} is out of date, rerun build_tables.py")
+
+    for module, budget in IMPORT_BUDGETS.items():
+        # take the best of a few runs so a busy machine (or the first run writing the bytecode cache) doesn't fail the check
+        profiles = [import_profile(module) for _ in range(5)]
+        best = min(profile[module] for profile in profiles)
+        print(f"{module}: {best} us (budget {budget} us)")
+        if best > budget:
+            problems.append(f"importing {module} took {best} us, but the budget is {budget} us")
+        for name in FORBIDDEN_IMPORTS:
+            if name in profiles[0]:
+                problems.append(f"importing {module} pulls in {name}")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the lookup tables used by the assembler and disassembler.")
+    parser.add_argument("-c", "--check", help="check tables.py and the CLI startup budgets instead of regenerating", required=False, action="store_true")
+    args = vars(parser.parse_args())
+
+    if args["check"]:
+        problems = check()
+        if problems:
+            print("\n" + "\n".join(problems))
+            sys.exit(1)
+        print("\nStartup check passed 😊")
+    else:
+        TABLES_PATH.write_text(render_tables())
+        print(f"Wrote {TABLES_PATH.name}")
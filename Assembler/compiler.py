@@ -0,0 +1,591 @@
+from machine_state import REGISTER_COUNT, RAM_SIZE, wrap
+import re
+
+# compiles a small expression language into assembly for assembler.py, for example:
+#
+#     i = 0;
+#     total = 0;
+#     while (i < 10) {
+#         total = total + i;
+#         i = i + 1;
+#     }
+#     if (total != 45) { rm0 = -1; } else { rm0 = total; }
+#
+# variables live in the 16 registers (spilled to RAM from rm255 downwards only when there are too many alive at once),
+# rmN reads or writes RAM cell N directly, and the operators are + - & | ^ and unary - ~ (like the CPU's operations)
+# conditions of while and if compare two expressions with > < >= <= == !=, the program ends by jumping to itself
+
+TOKEN = re.compile(r"\s*(?:(#[^\n]*)|(\d+)|([A-Za-z_]\w*)|(==|!=|>=|<=|[-+&|^~<>=(){};]))")
+
+BINARY_OPS = {"+": "_add_", "-": "_sub_", "&": "_and_", "|": "_bor_", "^": "_xor_"}
+UNARY_OPS = {"-": "_inv_", "~": "_not_"}
+FOLD = {
+    "_add_": lambda a, b: a + b, "_sub_": lambda a, b: a - b, "_and_": lambda a, b: a & b,
+    "_bor_": lambda a, b: a | b, "_xor_": lambda a, b: a ^ b, "_inv_": lambda a: -a, "_not_": lambda a: ~a,
+}
+NEGATED = {">": "<=", "<": ">=", ">=": "<", "<=": ">", "==": "!=", "!=": "=="}
+
+
+# parsing, the syntax tree is made of tuples: ("num", value), ("var", name), ("mem", address), ("bin", operation, left, right),
+# ("un", operation, operand), ("assign", target, expr), ("while", cond, body), ("if", cond, then, else), where a condition is
+# (comparison, left, right) and targets are ("var", name) or ("mem", address)
+
+def tokenize(source: str) -> list[tuple[str, int]]:
+    """Split the source into (token, line number) pairs, dropping comments."""
+    tokens = []
+    line_num = 1
+    pos = 0
+    source = source.rstrip()
+    while pos < len(source):
+        match = TOKEN.match(source, pos)
+        if match is None:
+            token = source[pos:].split()[0]
+            line_num += source.count("\n", pos, source.index(token, pos))
+            raise ValueError(f"Line #{line_num} is invalid, because '{token}' is invalid. Specified reason: invalid token.")
+        line_num += source.count("\n", pos, match.start(match.lastindex))
+        if match.lastindex != 1:
+            tokens.append((match.group(match.lastindex), line_num))
+        pos = match.end()
+    return tokens
+
+
+class Parser:
+    """Recursive descent parser for the expression language."""
+
+    def __init__(self, source: str):
+        self.tokens = tokenize(source)
+        self.pos = 0
+
+    def peek(self) -> str | None:
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def error(self, reason: str) -> ValueError:
+        if self.pos < len(self.tokens):
+            token, line_num = self.tokens[self.pos]
+        else:
+            token, line_num = "end of file", self.tokens[-1][1] if self.tokens else 1
+        return ValueError(f"Line #{line_num} is invalid, because '{token}' is invalid. Specified reason: {reason}.")
+
+    def expect(self, token: str) -> None:
+        if self.peek() != token:
+            raise self.error(f"expected '{token}'")
+        self.pos += 1
+
+    def program(self) -> list[tuple]:
+        statements = []
+        while self.peek() is not None:
+            statements.append(self.statement())
+        return statements
+
+    def block(self) -> list[tuple]:
+        self.expect("{")
+        statements = []
+        while self.peek() != "}":
+            if self.peek() is None:
+                raise self.error("expected '}'")
+            statements.append(self.statement())
+        self.pos += 1
+        return statements
+
+    def statement(self) -> tuple:
+        token = self.peek()
+        if token == "while":
+            self.pos += 1
+            return ("while", self.condition(), self.block())
+        if token == "if":
+            self.pos += 1
+            cond, then = self.condition(), self.block()
+            otherwise = []
+            if self.peek() == "else":
+                self.pos += 1
+                otherwise = [self.statement()] if self.peek() == "if" else self.block()
+            return ("if", cond, then, otherwise)
+
+        target = self.primary()
+        if target[0] not in ("var", "mem"):
+            raise self.error("expected a variable or RAM cell to assign to")
+        self.expect("=")
+        expr = self.expression()
+        self.expect(";")
+        return ("assign", target, expr)
+
+    def condition(self) -> tuple:
+        self.expect("(")
+        left = self.expression()
+        cmp = self.peek()
+        if cmp not in NEGATED:
+            raise self.error("expected a comparison")
+        self.pos += 1
+        right = self.expression()
+        self.expect(")")
+        return (cmp, left, right)
+
+    def expression(self, precedence: int = 0) -> tuple:
+        # lowest to highest precedence, like C: | ^ & then + -
+        levels = [("|",), ("^",), ("&",), ("+", "-")]
+        if precedence == len(levels):
+            return self.unary()
+        left = self.expression(precedence + 1)
+        while self.peek() in levels[precedence]:
+            op = BINARY_OPS[self.peek()]
+            self.pos += 1
+            right = self.expression(precedence + 1)
+            left = ("num", wrap(FOLD[op](left[1], right[1]))) if left[0] == right[0] == "num" else ("bin", op, left, right)
+        return left
+
+    def unary(self) -> tuple:
+        if self.peek() in UNARY_OPS:
+            op = UNARY_OPS[self.peek()]
+            self.pos += 1
+            operand = self.unary()
+            return ("num", wrap(FOLD[op](operand[1]))) if operand[0] == "num" else ("un", op, operand)
+        return self.primary()
+
+    def primary(self) -> tuple:
+        token = self.peek()
+        if token is None:
+            raise self.error("expected an expression")
+        self.pos += 1
+        if token == "(":
+            expr = self.expression()
+            self.expect(")")
+            return expr
+        if token.isdigit():
+            if int(token) >= 2**16:
+                self.pos -= 1
+                raise self.error("invalid number")
+            return ("num", wrap(int(token)))
+        if re.fullmatch(r"rm\d+", token):
+            if int(token[2:]) >= RAM_SIZE:
+                self.pos -= 1
+                raise self.error("invalid ram address")
+            return ("mem", int(token[2:]))
+        if re.fullmatch(r"[A-Za-z_]\w*", token) and token not in ("while", "if", "else") and not re.fullmatch(r"(rg|ln)\d+", token):
+            return ("var", token)
+        self.pos -= 1
+        raise self.error("expected an expression")
+
+
+# lowering to three-address code over virtual registers, each instruction is a tuple:
+# ("rst", dst, integer), ("op", operation, (srcs...), dst), ("rld", address, dst), ("rms", address, src),
+# ("label", name), ("jmp", label), ("cjp", label, src1, src2, comparison operation), ("halt",)
+
+class Lowering:
+    """Turns the syntax tree into three-address code, the naive flavor translates each construct as directly as possible."""
+
+    def __init__(self, naive: bool):
+        self.naive = naive
+        self.code = []
+        self.temps = 0
+        self.labels = 0
+        self.variables = set()
+        self.constants = [] # stack of {value: virtual register} for constants hoisted out of the enclosing loops
+
+    def temp(self) -> str:
+        self.temps += 1
+        return f"%t{self.temps}"
+
+    def label(self) -> str:
+        self.labels += 1
+        return f"L{self.labels}"
+
+    def program(self, statements: list[tuple]) -> list[tuple]:
+        self.variables = {target[1] for target in assigned(statements) if target[0] == "var"}
+        self.statements(statements)
+        self.code.append(("halt",))
+        return self.code
+
+    def statements(self, statements: list[tuple]) -> None:
+        for statement in statements:
+            getattr(self, f"lower_{statement[0]}")(*statement[1:])
+
+    def lower_assign(self, target: tuple, expr: tuple) -> None:
+        if target[0] == "mem":
+            self.code.append(("rms", target[1], self.expr(expr)))
+            return
+        src = self.expr(expr, target[1])
+        if src != target[1]:
+            self.code.append(("op", "_rrd_", (src,), target[1]))
+
+    def lower_while(self, cond: tuple, body: list[tuple]) -> None:
+        top, test, end = self.label(), self.label(), self.label()
+        if self.naive: # test at the top, jump back at the bottom
+            self.code.append(("label", top))
+            self.branch(cond, False, end)
+            self.statements(body)
+            self.code += [("jmp", top), ("label", end)]
+            return
+
+        # constants are loaded once before the loop instead of on every iteration
+        hoisted = {}
+        for value in sorted(constants_in([("while", cond, body)])):
+            if not any(value in outer for outer in self.constants):
+                hoisted[value] = self.temp()
+                self.code.append(("rst", hoisted[value], value))
+        self.constants.append(hoisted)
+        # the test sits at the bottom so each iteration only runs one conditional jump
+        self.code += [("jmp", test), ("label", top)]
+        self.statements(body)
+        self.code.append(("label", test))
+        self.branch(cond, True, top)
+        self.constants.pop()
+
+    def lower_if(self, cond: tuple, then: list[tuple], otherwise: list[tuple]) -> None:
+        skip, end = self.label(), self.label()
+        self.branch(cond, False, skip)
+        self.statements(then)
+        if otherwise:
+            self.code.append(("jmp", end))
+        self.code.append(("label", skip))
+        if otherwise:
+            self.statements(otherwise)
+            self.code.append(("label", end))
+
+    def branch(self, cond: tuple, when: bool, target: str) -> None:
+        """Jump to target when the condition is (or isn't) true, using _cjp_ with _grt_ and _eql_."""
+        cmp, left, right = cond
+        if not when:
+            cmp = NEGATED[cmp]
+        a, b = self.expr(left), self.expr(right)
+        if cmp == ">":
+            self.code.append(("cjp", target, a, b, "_grt_"))
+        elif cmp == "<":
+            self.code.append(("cjp", target, b, a, "_grt_"))
+        elif cmp == "==":
+            self.code.append(("cjp", target, a, b, "_eql_"))
+        elif cmp == ">=":
+            self.code += [("cjp", target, a, b, "_grt_"), ("cjp", target, a, b, "_eql_")]
+        elif cmp == "<=":
+            self.code += [("cjp", target, b, a, "_grt_"), ("cjp", target, a, b, "_eql_")]
+        elif cmp == "!=":
+            skip = self.label()
+            self.code += [("cjp", skip, a, b, "_eql_"), ("jmp", target), ("label", skip)]
+
+    def expr(self, expr: tuple, dst: str | None = None) -> str:
+        """Evaluate an expression into a virtual register (dst if given and an instruction is needed), returns the register."""
+        kind = expr[0]
+        if kind == "var":
+            if expr[1] not in self.variables:
+                raise ValueError(f"Variable '{expr[1]}' is invalid, because it is never assigned.")
+            return expr[1]
+        if kind == "num":
+            for constants in self.constants:
+                if expr[1] in constants and dst is None:
+                    return constants[expr[1]]
+            dst = dst or self.temp()
+            self.code.append(("rst", dst, expr[1]))
+            return dst
+        if kind == "mem":
+            dst = dst or self.temp()
+            self.code.append(("rld", expr[1], dst))
+            return dst
+        srcs = tuple(self.expr(operand) for operand in expr[2:])
+        dst = dst or self.temp()
+        self.code.append(("op", expr[1], srcs, dst))
+        return dst
+
+def assigned(statements: list[tuple]) -> list[tuple]:
+    """Every assignment target in the statements."""
+    targets = []
+    for statement in statements:
+        if statement[0] == "assign":
+            targets.append(statement[1])
+        else:
+            targets += assigned([s for block in statement[2:] for s in block])
+    return targets
+
+def constants_in(statements: list[tuple]) -> set[int]:
+    """Every integer used as an operand (not assigned on its own) in the statements and their conditions."""
+    values = set()
+    def visit(expr: tuple, top: bool) -> None:
+        if expr[0] == "num" and not top:
+            values.add(expr[1])
+        elif expr[0] in ("bin", "un"):
+            for operand in expr[2:]:
+                visit(operand, False)
+    for statement in statements:
+        if statement[0] == "assign":
+            visit(statement[2], statement[1][0] == "var")
+        else:
+            visit(statement[1][1], False)
+            visit(statement[1][2], False)
+            values |= constants_in([s for block in statement[2:] for s in block])
+    return values
+
+
+# register allocation
+
+def uses_defs(instruction: tuple) -> tuple[tuple[str, ...], tuple[str, ...]]:
+    """The virtual registers an instruction reads and writes."""
+    kind = instruction[0]
+    if kind == "rst":
+        return (), (instruction[1],)
+    if kind == "op":
+        return instruction[2], (instruction[3],)
+    if kind == "rld":
+        return (), (instruction[2],)
+    if kind == "rms":
+        return (instruction[2],), ()
+    if kind == "cjp":
+        return (instruction[2], instruction[3]), ()
+    return (), ()
+
+def peephole(code: list[tuple]) -> list[tuple]:
+    """Drop unreachable code and jumps to the very next line."""
+    result = []
+    reachable = True
+    for i, instruction in enumerate(code):
+        if instruction[0] == "label":
+            reachable = True
+        if not reachable:
+            continue
+        if instruction[0] == "jmp":
+            following = code[i + 1:]
+            labels = []
+            for after in following:
+                if after[0] != "label":
+                    break
+                labels.append(after[1])
+            reachable = False
+            if instruction[1] in labels:
+                continue
+        result.append(instruction)
+    return result
+
+def live_intervals(code: list[tuple]) -> dict[str, tuple[int, int]]:
+    """Live interval of each virtual register, instruction i reads at position 2i and writes at 2i + 1."""
+    labels = {instruction[1]: i for i, instruction in enumerate(code) if instruction[0] == "label"}
+    successors = []
+    for i, instruction in enumerate(code):
+        if instruction[0] == "jmp":
+            successors.append([labels[instruction[1]]])
+        elif instruction[0] == "cjp":
+            successors.append([labels[instruction[1]], i + 1])
+        elif instruction[0] == "halt":
+            successors.append([])
+        else:
+            successors.append([i + 1])
+    uses_and_defs = [uses_defs(instruction) for instruction in code]
+
+    live_in = [set() for _ in code]
+    live_out = [set() for _ in code]
+    changed = True
+    while changed:
+        changed = False
+        for i in reversed(range(len(code))):
+            out = set().union(*(live_in[j] for j in successors[i] if j < len(code)))
+            uses, defs = uses_and_defs[i]
+            new_in = set(uses) | (out - set(defs))
+            if out != live_out[i] or new_in != live_in[i]:
+                live_out[i], live_in[i] = out, new_in
+                changed = True
+
+    intervals = {}
+    def extend(vreg: str, position: int) -> None:
+        start, end = intervals.get(vreg, (position, position))
+        intervals[vreg] = (min(start, position), max(end, position))
+    for i, (uses, defs) in enumerate(uses_and_defs):
+        for vreg in live_in[i]:
+            extend(vreg, 2 * i)
+        for vreg in defs:
+            extend(vreg, 2 * i + 1)
+        for vreg in live_out[i]:
+            extend(vreg, 2 * i + 1)
+    return intervals
+
+def linear_scan(intervals: dict[str, tuple[int, int]], registers: list[int], hints: dict[str, str]) -> tuple[dict[str, int], list[str]]:
+    """Assign registers to live intervals, returns the assignment and the virtual registers that have to be spilled."""
+    assignment = {}
+    spilled = []
+    active = [] # assigned intervals overlapping the current one, sorted by end
+    free = sorted(registers)
+    for vreg in sorted(intervals, key=lambda vreg: intervals[vreg]):
+        start, end = intervals[vreg]
+        for expired in [other for other in active if intervals[other][1] < start]:
+            active.remove(expired)
+            free.append(assignment[expired])
+        free.sort()
+
+        if free:
+            hinted = assignment.get(hints.get(vreg))
+            register = hinted if hinted in free else free[0] # reuse a copy's source register so the copy disappears
+            free.remove(register)
+            assignment[vreg] = register
+        else:
+            # no register left, spill whichever interval ends last
+            victim = active[-1]
+            if intervals[victim][1] <= end:
+                spilled.append(vreg)
+                continue
+            assignment[vreg] = assignment.pop(victim)
+            active.remove(victim)
+            spilled.append(victim)
+        active.append(vreg)
+        active.sort(key=lambda other: intervals[other][1])
+    return assignment, spilled
+
+
+def emit(code: list[tuple], assignment: dict[str, int], slots: dict[str, int], scratch: list[int]) -> list[str]:
+    """Turn allocated three-address code into assembly, loading and storing spilled virtual registers around each use."""
+    lines = []
+    labels = {}
+    def load(vreg: str, index: int) -> str:
+        if vreg in assignment:
+            return f"rg{assignment[vreg]}"
+        lines.append(f"_rld_ rm{slots[vreg]} rg{scratch[index]}")
+        return f"rg{scratch[index]}"
+    def store(vreg: str, instruction: str) -> None:
+        # instruction has a {} where the destination register goes
+        if vreg in assignment:
+            lines.append(instruction.format(f"rg{assignment[vreg]}"))
+        else:
+            lines.extend([instruction.format(f"rg{scratch[0]}"), f"_rms_ rm{slots[vreg]} rg{scratch[0]}"])
+
+    for instruction in code:
+        kind = instruction[0]
+        if kind == "label":
+            labels[instruction[1]] = len(lines)
+        elif kind == "rst":
+            store(instruction[1], f"_rst_ {{}} {instruction[2]}")
+        elif kind == "rld":
+            store(instruction[2], f"_rld_ rm{instruction[1]} {{}}")
+        elif kind == "rms":
+            lines.append(f"_rms_ rm{instruction[1]} {load(instruction[2], 0)}")
+        elif kind == "op" and instruction[1] == "_rrd_":
+            src, dst = instruction[2][0], instruction[3]
+            if src in assignment and dst in assignment:
+                if assignment[src] != assignment[dst]:
+                    lines.append(f"_rrd_ rg{assignment[src]} rg{assignment[dst]}")
+            elif dst in assignment:
+                lines.append(f"_rld_ rm{slots[src]} rg{assignment[dst]}")
+            else:
+                lines.append(f"_rms_ rm{slots[dst]} {load(src, 0)}")
+        elif kind == "op":
+            srcs = [load(src, i) for i, src in enumerate(instruction[2])]
+            store(instruction[3], f"{instruction[1]} {' '.join(srcs)} {{}}")
+        elif kind == "cjp":
+            a, b = load(instruction[2], 0), load(instruction[3], 1)
+            lines.append(f"_cjp_ ln{{{instruction[1]}}} {a} {b} {instruction[4]}")
+        elif kind == "jmp":
+            lines.append(f"_jmp_ ln{{{instruction[1]}}}")
+        elif kind == "halt":
+            lines.append(f"_jmp_ ln{len(lines)}")
+    return [line.format(**labels) if "{" in line else line for line in lines]
+
+def compile_program(source: str, naive: bool = False) -> list[str]:
+    """Compile a program into lines of assembly, naive keeps every variable in RAM and translates each construct directly."""
+    statements = Parser(source).program()
+    code = Lowering(naive).program(statements)
+    if not naive:
+        code = peephole(code)
+
+    intervals = live_intervals(code)
+    used_ram = {target[1] for target in assigned(statements) if target[0] == "mem"} | {
+        instruction[1] for instruction in code if instruction[0] == "rld"}
+    free_ram = [address for address in reversed(range(RAM_SIZE)) if address not in used_ram]
+
+    if naive: # variables stay in RAM, but each operation still computes into a register with a single instruction
+        variables = sorted(vreg for vreg in intervals if not vreg.startswith("%"))
+        temporaries = {vreg: interval for vreg, interval in intervals.items() if vreg.startswith("%")}
+        assignment, spilled = linear_scan(temporaries, list(range(REGISTER_COUNT - 2)), {})
+        spilled = variables + spilled
+    else:
+        hints = {instruction[3]: instruction[2][0] for instruction in code if instruction[0] == "op" and instruction[1] == "_rrd_"}
+        assignment, spilled = linear_scan(intervals, list(range(REGISTER_COUNT)), hints)
+        if spilled: # spilled values need scratch registers to pass through, so give up two and try again
+            assignment, spilled = linear_scan(intervals, list(range(REGISTER_COUNT - 2)), hints)
+    if len(spilled) > len(free_ram):
+        raise ValueError(f"Program is invalid, because {len(spilled)} values had to be spilled but only {len(free_ram)} RAM cells are free.")
+    slots = dict(zip(spilled, free_ram))
+    return emit(code, assignment, slots, [REGISTER_COUNT - 2, REGISTER_COUNT - 1])
+
+
+# some test programs, compiled and run on the emulator: program: the RAM cells it should end with
+
+test_cases = {
+    # the example at the top
+    "i = 0; total = 0; while (i < 10) { total = total + i; i = i + 1; } if (total != 45) { rm0 = -1; } else { rm0 = total; }":
+        {"rm0": 45},
+    "a = 0; b = 1; i = 0; while (i < 10) { t = a + b; a = b; b = t; i = i + 1; } rm1 = a;": {"rm1": 55},
+    "x = 12; rm2 = (x & 10) | (x ^ 3); rm3 = -x; rm4 = ~x; rm5 = x - 20 + -(3 - x);": {"rm2": 15, "rm3": -12, "rm4": -13, "rm5": 1},
+    "x = 32767; rm6 = x + 1; y = -32768; rm7 = -y;": {"rm6": -32768, "rm7": -32768}, # wrapping around like the CPU
+    "i = 0; c = 0; while (i < 20) { if (i >= 5) { if (i <= 14) { c = c + 1; } } else if (i == 0) { c = c + 100; } i = i + 1; } rm8 = c;":
+        {"rm8": 110},
+    "rm10 = 7; rm11 = rm10 + rm10; rm10 = rm11 - rm10; rm12 = rm10;": {"rm10": 7, "rm11": 14, "rm12": 7},
+    # more values alive at once than there are registers, so some are spilled to RAM
+    " ".join(f"v{i} = {i + 1};" for i in range(20)) + " rm9 = " + " + ".join(f"v{i}" for i in range(20)) + "; rm13 = v0 - v19;":
+        {"rm9": 210, "rm13": -19},
+}
+
+def run_test(source: str, naive: bool = False) -> "Machine":
+    """Compile and run a program on the emulator."""
+    from assembler import assemble
+    from emulator import Machine
+
+    machine = Machine([int(word, 16) for word in assemble(compile_program(source, naive))])
+    halt = machine.run_until_halt(100_000)
+    if halt.reason != "self jump":
+        raise ValueError(f"Program is invalid, because it halted with '{halt.reason}' instead of ending.")
+    return machine
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile a small expression language into assembly code.")
+    parser.add_argument("input", type=str, nargs="?", help="Input file containing the program.")
+    parser.add_argument("-t", "--test", help="run the test programs on the emulator instead of compiling user input", required=False, action="store_true")
+    parser.add_argument("-o", "--output", type=str, help="output text file to write the assembly code to (default is output.txt)", default="output.txt")
+    parser.add_argument("-n", "--naive", help="translate naively (every variable in RAM), for comparison", required=False, action="store_true")
+    parser.add_argument("-c", "--compare", help="compare the instruction counts against the naive translation", required=False, action="store_true")
+    args = vars(parser.parse_args())
+
+    if args["test"]:
+        print("Running test cases...")
+        failed = False
+        for i, (source, expected) in enumerate(test_cases.items()):
+            for naive in (False, True):
+                try:
+                    machine = run_test(source, naive)
+                except ValueError as e:
+                    if naive and "spilled" in str(e):
+                        continue # the naive translation keeping every value in RAM running out of it is expected
+                    failed = True
+                    print(f"Failed case #{i}{' (naive)' if naive else ''}: {e}")
+                    continue
+                actual = {location: machine.read(location) for location in expected}
+                if actual != expected:
+                    failed = True
+                    print(f"Failed case #{i}{' (naive)' if naive else ''}: ended with {actual}, expected {expected}")
+        print(f"\nTest Results: Compiler working {'improperly 🫠' if failed else 'properly 😊'}")
+        raise SystemExit(1 if failed else 0)
+    if not args["input"]:
+        parser.error("the input program is required")
+
+    with open(args["input"], "r") as f:
+        source = f.read()
+    try:
+        assembly_code = compile_program(source, args["naive"])
+    except ValueError as e:
+        print(e)
+        raise SystemExit(1)
+    with open(args["output"], "w+") as output:
+        output.write("\n".join(assembly_code) + "\n")
+    print("\n".join(assembly_code))
+
+    if args["compare"]:
+        from assembler import assemble
+        from emulator import Machine
+
+        try:
+            naive_code = compile_program(source, True)
+        except ValueError as e:
+            print(f"\nCan't compare against the naive translation: {e}")
+            raise SystemExit(1)
+        print("\n                  optimized  naive")
+        counts = []
+        for code in (assembly_code, naive_code):
+            machine = Machine([int(word, 16) for word in assemble(code)])
+            counts.append((len(code), machine.run_until_halt(1_000_000).steps))
+        print(f"instructions      {counts[0][0]:>9}  {counts[1][0]:>5}")
+        print(f"executed          {counts[0][1]:>9}  {counts[1][1]:>5}")
@@ -0,0 +1,219 @@
+from emulator import decode_word, read_image
+from pathlib import Path
+from typing import NamedTuple
+import xml.etree.ElementTree as ET
+
+# static performance estimate of a program on CPU.circ: what every operation costs, and which parts of the program
+# (basic blocks, weighted by how deeply they're nested in loops) those costs add up in, without running anything
+
+CIRCUIT_PATH = Path(__file__).parent.parent / "CPU.circ"
+
+PRIMITIVES = { # components that add a level of gate delay
+    "AND Gate", "OR Gate", "XOR Gate", "NOT Gate", "NAND Gate", "NOR Gate", "XNOR Gate", "Buffer",
+    "Multiplexer", "Demultiplexer", "Decoder",
+}
+
+# which of the main circuit's units each operation's data goes through (read off CPU.circ: SixteenBitEfficientALU
+# selects add/sub/greater than/equal to with WhichOP, BLU selects and/or/xor/not/negate with Choice), on top of the
+# instruction decoding and register file every operation goes through
+OPCODE_UNITS = {
+    "_add_": ["SixteenBitEfficientALU"],
+    "_sub_": ["SixteenBitEfficientALU"],
+    "_grt_": ["SixteenBitEfficientALU"],
+    "_eql_": ["SixteenBitEfficientALU"],
+    "_jmp_": [],
+    "_cjp_": ["SixteenBitEfficientALU"],
+    "_rst_": [],
+    "_rrd_": [],
+    "_rcl_": [],
+    "_and_": ["BLU"],
+    "_bor_": ["BLU"],
+    "_xor_": ["BLU"],
+    "_not_": ["BLU"],
+    "_rld_": [],
+    "_rms_": [],
+    "_inv_": ["BLU"],
+}
+COMMON_UNITS = ["FourBitEquals", "Registers"]
+
+CYCLES = 1 # the CPU is single cycle: the line number register, registers and RAM all latch on the same clock tick
+
+class Cost(NamedTuple):
+    cycles: int  # clock cycles
+    gates: int   # gates in the units the operation's data passes through
+
+
+def read_circuits(path: Path = CIRCUIT_PATH) -> dict[str, tuple[int, list[str]]]:
+    """Read every circuit in a Logisim file as (amount of primitive gates, names of the subcircuits it instantiates)."""
+    circuits = {}
+    root = ET.parse(path).getroot()
+    names = {circuit.get("name") for circuit in root.iter("circuit")}
+    for circuit in root.iter("circuit"):
+        gates = 0
+        children = []
+        for comp in circuit.iter("comp"):
+            if comp.get("lib") is None and comp.get("name") in names:
+                children.append(comp.get("name"))
+            elif comp.get("name") in PRIMITIVES:
+                gates += 1
+        circuits[circuit.get("name")] = (gates, children)
+    return circuits
+
+def unit_gates(circuits: dict[str, tuple[int, list[str]]]) -> dict[str, int]:
+    """Total gates of every circuit, counting the gates of its subcircuits.
+
+    This is a measure of how much hardware an operation exercises, not of its critical path: that needs the wires traced,
+    which needs Logisim's component geometry, gate delays can be declared with a table instead.
+    """
+    totals = {}
+    def visit(name: str) -> int:
+        if name not in totals:
+            gates, children = circuits[name]
+            totals[name] = gates + sum(visit(child) for child in children)
+        return totals[name]
+    for name in circuits:
+        visit(name)
+    return totals
+
+def opcode_costs(path: Path = CIRCUIT_PATH, table: dict[str, dict] | None = None) -> dict[str, Cost]:
+    """The cost of every operation, derived from the circuit, with any entries of a declared table taking precedence."""
+    units = unit_gates(read_circuits(path))
+    costs = {}
+    for operation, operation_units in OPCODE_UNITS.items():
+        costs[operation] = Cost(CYCLES, sum(units[unit] for unit in COMMON_UNITS + operation_units))
+    for operation, declared in (table or {}).items():
+        if operation not in costs:
+            raise ValueError(f"Operation '{operation}' is invalid, because it isn't one of the CPU's operations.")
+        for field in declared:
+            if field not in Cost._fields:
+                raise ValueError(f"Cost '{field}' of operation '{operation}' is invalid, because it isn't one of {', '.join(Cost._fields)}.")
+        costs[operation] = costs[operation]._replace(**declared)
+    return costs
+
+
+class Block(NamedTuple):
+    start: int       # first line
+    end: int         # line after the last one
+    loop_depth: int  # how many loops the block is nested in
+    cycles: int      # cycles to run the block once
+    estimate: int    # estimated cycles over the whole run, assuming every loop iterates trip_count times
+
+def basic_blocks(instructions: list[tuple[str, tuple]]) -> list[tuple[int, int]]:
+    """Split a program into basic blocks (start line, end line), they start at jump targets and end after jumps."""
+    leaders = {0}
+    for ln, (operation, operands) in enumerate(instructions):
+        if operation in ("_jmp_", "_cjp_"):
+            leaders.add(operands[0])
+            leaders.add(ln + 1)
+    leaders = sorted(ln for ln in leaders if ln < len(instructions))
+    return list(zip(leaders, leaders[1:] + [len(instructions)]))
+
+def estimate(instructions: list[tuple[str, tuple]], costs: dict[str, Cost], trip_count: int = 10) -> list[Block]:
+    """Estimate the cost of every basic block, loops are backward jumps and are assumed to run trip_count times."""
+    loops = [(operands[0], ln) for ln, (operation, operands) in enumerate(instructions)
+        if operation in ("_jmp_", "_cjp_") and operands[0] < ln] # a jump to itself halts rather than loops
+    blocks = []
+    for start, end in basic_blocks(instructions):
+        loop_depth = sum(first <= start <= last for first, last in loops)
+        cycles = sum(costs[instructions[ln][0]].cycles for ln in range(start, end))
+        blocks.append(Block(start, end, loop_depth, cycles, cycles * trip_count ** loop_depth))
+    return blocks
+
+def read_program(path: str) -> list[tuple[str, tuple]]:
+    """Read a program from a ROM image (v2.0 raw) or assembly code, as (operation, operands) per line."""
+    with open(path, "r") as f:
+        first_line = f.readline()
+    if first_line.startswith("v2.0 raw"):
+        return [decode_word(word) for word in read_image(path)]
+
+    import assembler
+    with open(path, "r") as f:
+        assembled_code = assembler.assemble(f.readlines())
+    if assembler.errors:
+        raise ValueError("\n".join(assembler.errors.messages()))
+    return [decode_word(int(code, 16)) for code in assembled_code]
+
+
+# test cases on the test program (tests/assembly.txt), whose _cjp_ back to line 0 at line 14 is (statically) a loop
+
+TEST_PROGRAM = "../tests/assembly.txt"
+
+test_blocks = [(0, 13), (13, 14), (14, 15), (15, 26), (26, 27)] # jump targets 0, 14 and 26 start blocks, jumps end them
+test_estimates = [ # (loop depth, cycles, estimated cycles) of each block, with loops running 10 times
+    (1, 13, 130), (1, 1, 10), (1, 1, 10), (0, 11, 11), (0, 1, 1),
+]
+
+def run_tests(path: Path = CIRCUIT_PATH) -> list[str]:
+    """Check the basic blocks and estimates of the test program and the cost table's validation, returns the failures."""
+    failures = []
+    instructions = read_program(str(Path(__file__).parent / TEST_PROGRAM))
+    costs = opcode_costs(path)
+    if basic_blocks(instructions) != test_blocks:
+        failures.append(f"basic blocks are {basic_blocks(instructions)}, expected {test_blocks}")
+    estimates = [(block.loop_depth, block.cycles, block.estimate) for block in estimate(instructions, costs, 10)]
+    if estimates != test_estimates:
+        failures.append(f"estimates are {estimates}, expected {test_estimates}")
+    if costs["_add_"].gates <= costs["_rst_"].gates or costs["_add_"].gates != costs["_sub_"].gates:
+        failures.append("the ALU's operations should pass through the same, larger, amount of gates than _rst_")
+    if opcode_costs(path, {"_add_": {"cycles": 2}})["_add_"].cycles != 2:
+        failures.append("a declared cost didn't take precedence")
+    for table in ({"_nop_": {"cycles": 1}}, {"_add_": {"latency": 2}}):
+        try:
+            opcode_costs(path, table)
+            failures.append(f"{table} should be invalid")
+        except ValueError:
+            pass
+    return failures
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Estimate what a program costs on the CPU, before running it in Logisim.")
+    parser.add_argument("input", type=str, nargs="?", help="Input file containing assembly code or a ROM image (v2.0 raw), "
+        "without one the cost of every operation is printed")
+    parser.add_argument("-c", "--circuit", type=str, help="Logisim circuit to derive the costs from (default is ../CPU.circ)", default=str(CIRCUIT_PATH))
+    parser.add_argument("-t", "--table", type=str, help="JSON file declaring costs that take precedence over the circuit's, "
+        'like {"_add_": {"cycles": 2}}', default=None)
+    parser.add_argument("-l", "--trip-count", type=int, help="how many times each loop is assumed to run (default is 10)", default=10)
+    parser.add_argument("-n", "--top", type=int, help="amount of costliest blocks to point out (default is 5)", default=5)
+    parser.add_argument("--test", help="run the test cases on the test program instead", required=False, action="store_true")
+    args = vars(parser.parse_args())
+
+    if args["test"]:
+        print("Running test cases...")
+        failures = run_tests(Path(args["circuit"]))
+        for failure in failures:
+            print(f"Failed case: {failure}")
+        print(f"\nTest Results: Cost model working {'improperly 🫠' if failures else 'properly 😊'}")
+        raise SystemExit(1 if failures else 0)
+
+    table = None
+    if args["table"]:
+        with open(args["table"], "r") as f:
+            table = json.load(f)
+    costs = opcode_costs(Path(args["circuit"]), table)
+
+    if not args["input"]:
+        print(f"{'operation':<10} {'cycles':>6} {'gates':>6}")
+        for operation, cost in costs.items():
+            print(f"{operation:<10} {cost.cycles:>6} {cost.gates:>6}")
+        raise SystemExit
+
+    try:
+        instructions = read_program(args["input"])
+    except ValueError as e:
+        print(e)
+        raise SystemExit(1)
+    blocks = estimate(instructions, costs, args["trip_count"])
+
+    print(f"{'lines':<12} {'loops':>5} {'cycles':>6} {'estimated cycles':>16}")
+    for block in blocks:
+        print(f"{f'{block.start}-{block.end - 1}':<12} {block.loop_depth:>5} {block.cycles:>6} {block.estimate:>16}")
+    total = sum(block.estimate for block in blocks)
+    print(f"\nStatic cycles: {sum(block.cycles for block in blocks)}, estimated cycles: {total}")
+
+    print("\nCostliest blocks:")
+    for block in sorted(blocks, key=lambda block: block.estimate, reverse=True)[:args["top"]]:
+        print(f"lines {block.start}-{block.end - 1}: {block.estimate} estimated cycles ({block.estimate / total if total else 0:.0%})")
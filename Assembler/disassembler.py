@@ -1,46 +1,39 @@
 
-from definitions import Input, Operation
-import argparse
+from lru import LRUCache
+from tables import DECODE, BITWISE_CMPS
 
-def hex_to_bin(hx: str) -> str:
-    """Convert a hexadecimal string (8 hex digits) to a 32-bit binary string."""
-    return f"{int(hx, 16):032b}"
+# see assembler.py, the lookup tables are generated from definitions.py so startup doesn't pay for building the enums
 
 def decode_instruction(binary_instruction: str) -> str:
     """Decodes a single 32-bit binary instruction into assembly language."""
     
     # extract the opcode (first 4 bits)
     opcode_binary = binary_instruction[:4]
-    operation = None
     
     # find the matching operation based on the binary opcode
-    for op in Operation:
-        if op.bnry == opcode_binary:
-            operation = op
-            break
-
-    if operation is None:
+    try:
+        assembly_line, input_types = DECODE[opcode_binary]
+    except KeyError:
         raise ValueError(f"Unknown opcode: {opcode_binary}")
 
-    assembly_line = operation._value_
     index = 4
-    for input_type in operation.inputs:
-        if input_type == Input.RG:
+    for input_type in input_types:
+        if input_type == "rg":
             # register is 4 bits
             reg_value = int(binary_instruction[index:index+4], 2)
             assembly_line += f" rg{reg_value}"
             index += 4
-        elif input_type == Input.RM:
+        elif input_type == "rm":
             # RAM address is 8 bits
             ram_value = int(binary_instruction[index:index+8], 2)
             assembly_line += f" rm{ram_value}"
             index += 8
-        elif input_type == Input.LN:
+        elif input_type == "ln":
             # line number is 16 bits
             line_value = int(binary_instruction[index:index+16], 2)
             assembly_line += f" ln{line_value}"
             index += 16
-        elif input_type == Input.INTGR:
+        elif input_type == "intgr":
             # integer immediate is 16 bits signed
             int_value = int(binary_instruction[index:index+16], 2) # first assume that it's an unsigned 16-bit niteger
             # convert to 16-bit signed integer
@@ -48,12 +41,12 @@ def decode_instruction(binary_instruction: str) -> str:
                 int_value -= (1 << 16) # convert to signed integer by subtracting 2^16 (two's complement)
             assembly_line += f" {int_value}"
             index += 16
-        elif input_type == Input.BTWSE:
+        elif input_type == "btwse":
             # bitwise comparison operation (4 bits for opcode)
             found = False
-            for btwse_cmp_opcode in Operation.bitwise_cmps():
-                if binary_instruction[index:index+4] == btwse_cmp_opcode.bnry:
-                    assembly_line += f" {btwse_cmp_opcode._value_}"
+            for btwse_cmp, btwse_cmp_opcode in BITWISE_CMPS.items():
+                if binary_instruction[index:index+4] == btwse_cmp_opcode:
+                    assembly_line += f" {btwse_cmp}"
                     found = True
                     break
             
@@ -63,26 +56,35 @@ def decode_instruction(binary_instruction: str) -> str:
 
     return assembly_line
 
+def decode_word(word: int) -> str:
+    """Decodes a single 32-bit instruction word into assembly language."""
+    return decode_instruction(f"{word:032b}")
+
+decode_cache = LRUCache(decode_word, 4096) # instruction word: assembly line, images repeat the same words a lot
+
 def disassemble(hex_instructions: list[str]) -> list[str]:
     """Disassemble a list of hexadecimal instructions into assembly language."""
     assembly_code = []
     for hex_instruction in hex_instructions:
-        # convert hex to binary
-        binary_instruction = hex_to_bin(hex_instruction.strip())
-        # decode the binary instruction to assembly language
-        assembly_line = decode_instruction(binary_instruction)
+        # decode the instruction to assembly language, each distinct instruction word only gets decoded once
+        assembly_line = decode_cache(int(hex_instruction, 16))
         assembly_code.append(assembly_line)
     return assembly_code
 
 
-parser = argparse.ArgumentParser(description="Disassemble binary instructions into assembly language.")
-parser.add_argument("input", type=str, help="Input file containing hexadecimal instructions.")
-parser.add_argument("-o", "--output", type=str, help="Output file to write the disassembled assembly code to (default is output.txt)", default="output.txt")
-args = vars(parser.parse_args())
-
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Disassemble binary instructions into assembly language.")
+    parser.add_argument("input", type=str, help="Input file containing hexadecimal instructions.")
+    parser.add_argument("-o", "--output", type=str, help="Output file to write the disassembled assembly code to (default is output.txt)", default="output.txt")
+    parser.add_argument("-c", "--cache-size", type=int, help="amount of distinct instruction words to remember the assembly of (default is 4096)", default=4096)
+    parser.add_argument("-s", "--cache-stats", help="print how often the instruction cache was hit", required=False, action="store_true")
+    args = vars(parser.parse_args())
+
     input_file = args["input"]
     output_file = args["output"]
+    decode_cache.resize(args["cache_size"])
     with open(input_file, "r") as f:
         hex_instructions = " ".join(f.readlines()[1:]).split()
         assembly_code = disassemble(hex_instructions)
@@ -90,3 +92,5 @@ if __name__ == "__main__":
             for assembly_line in assembly_code:
                 out.write(f"{assembly_line}\n")
                 print(assembly_line)
+    if args["cache_stats"]:
+        print(f"\nInstruction cache: {decode_cache.stats()}")
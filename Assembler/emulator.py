@@ -0,0 +1,365 @@
+from machine_state import MachineState, REGISTER_COUNT, RAM_SIZE, wrap
+from pathlib import Path
+from tables import DECODE, BITWISE_CMPS
+from typing import Callable, NamedTuple
+
+# headless model of CPU.circ executing an assembled ROM image, so programs can be run and debugged without Logisim
+
+def read_image(path: str) -> list[int]:
+    """Read a Logisim "v2.0 raw" image (like the assembler's output) into a list of 32-bit instruction words."""
+    with open(path, "r") as f:
+        lines = f.readlines()
+    words = []
+    for word in " ".join(lines[1:]).split(): # the first line is the "v2.0 raw" header
+        # Logisim run-length encodes repeated words as "count*word"
+        count, _, hx = word.rpartition("*")
+        words += [int(hx, 16)] * (int(count) if count else 1)
+    return words
+
+def decode_word(word: int) -> tuple[str, tuple[int | str, ...]]:
+    """Decode a 32-bit instruction word into its operation and operands (register/RAM addresses, line numbers and integers as ints)."""
+    try:
+        operation, input_types = DECODE[f"{word >> 28:04b}"]
+    except KeyError:
+        raise ValueError(f"Unknown opcode: {word >> 28:04b}")
+
+    operands = []
+    shift = 28
+    for input_type in input_types:
+        if input_type == "rg":
+            shift -= 4
+            operands.append((word >> shift) & 0xF)
+        elif input_type == "rm":
+            shift -= 8
+            operands.append((word >> shift) & 0xFF)
+        elif input_type == "ln":
+            shift -= 16
+            operands.append((word >> shift) & 0xFFFF)
+        elif input_type == "intgr":
+            shift -= 16
+            operands.append(wrap(word >> shift))
+        elif input_type == "btwse":
+            shift -= 4
+            opcode = f"{(word >> shift) & 0xF:04b}"
+            for btwse_cmp, btwse_cmp_opcode in BITWISE_CMPS.items():
+                if opcode == btwse_cmp_opcode:
+                    operands.append(btwse_cmp)
+                    break
+            else:
+                raise ValueError(f"Unknown bitwise comparison opcode: {opcode}")
+    return operation, tuple(operands)
+
+
+# the semantics of each operation, a handler updates the machine and returns the line to jump to (None to fall through)
+
+_add = MachineState.add
+_sub = MachineState.sub
+
+def _grt(m: "Machine", a: int, b: int, c: int) -> None:
+    m.registers[c] = int(m.registers[a] > m.registers[b])
+
+def _eql(m: "Machine", a: int, b: int, c: int) -> None:
+    m.registers[c] = int(m.registers[a] == m.registers[b])
+
+def _jmp(m: "Machine", ln: int) -> int:
+    return ln
+
+def _cjp(m: "Machine", ln: int, a: int, b: int, cmp: str) -> int | None:
+    if m.registers[a] > m.registers[b] if cmp == "_grt_" else m.registers[a] == m.registers[b]:
+        return ln
+    return None
+
+def _rst(m: "Machine", a: int, intgr: int) -> None:
+    m.registers[a] = intgr
+
+def _rrd(m: "Machine", a: int, b: int) -> None:
+    m.registers[b] = m.registers[a]
+
+_rcl = MachineState.clear_registers
+
+def _and(m: "Machine", a: int, b: int, c: int) -> None:
+    m.registers[c] = m.registers[a] & m.registers[b]
+
+def _bor(m: "Machine", a: int, b: int, c: int) -> None:
+    m.registers[c] = m.registers[a] | m.registers[b]
+
+def _xor(m: "Machine", a: int, b: int, c: int) -> None:
+    m.registers[c] = m.registers[a] ^ m.registers[b]
+
+def _not(m: "Machine", a: int, b: int) -> None:
+    m.registers[b] = ~m.registers[a]
+
+def _rld(m: "Machine", rm: int, a: int) -> None:
+    m.registers[a] = m.ram[rm]
+
+def _rms(m: "Machine", rm: int, a: int) -> None:
+    m.ram[rm] = m.registers[a]
+
+_inv = MachineState.inv
+
+HANDLERS = {
+    "_add_": _add, "_sub_": _sub, "_grt_": _grt, "_eql_": _eql, "_jmp_": _jmp, "_cjp_": _cjp, "_rst_": _rst, "_rrd_": _rrd,
+    "_rcl_": _rcl, "_and_": _and, "_bor_": _bor, "_xor_": _xor, "_not_": _not, "_rld_": _rld, "_rms_": _rms, "_inv_": _inv,
+}
+
+def written_locations(operation: str, operands: tuple[int | str, ...]) -> list[str]:
+    """List the registers ("rgN") and RAM cells ("rmN") an instruction writes to, addresses are immediates so this is static."""
+    if operation in ("_add_", "_sub_", "_grt_", "_eql_", "_and_", "_bor_", "_xor_"):
+        return [f"rg{operands[2]}"]
+    elif operation == "_rst_":
+        return [f"rg{operands[0]}"]
+    elif operation in ("_rrd_", "_not_", "_inv_", "_rld_"):
+        return [f"rg{operands[1]}"]
+    elif operation == "_rms_":
+        return [f"rm{operands[0]}"]
+    elif operation == "_rcl_":
+        return [f"rg{i}" for i in range(REGISTER_COUNT)]
+    return []
+
+
+class Machine(MachineState):
+    """The CPU's state executing a decoded ROM image."""
+
+    __slots__ = ("rom", "instructions", "program", "steps")
+
+    def __init__(self, rom: list[int]):
+        super().__init__()
+        self.rom = rom
+        self.instructions = [decode_word(word) for word in rom] # (operation, operands) per line
+        self.program = [(HANDLERS[operation], operands) for operation, operands in self.instructions]
+        self.steps = 0  # instructions executed so far
+
+    def finished(self) -> bool:
+        """Whether execution ran past the end of the ROM image."""
+        return not 0 <= self.pc < len(self.program)
+
+    def step(self) -> None:
+        """Execute the instruction at the program counter."""
+        handler, operands = self.program[self.pc]
+        target = handler(self, *operands)
+        self.pc = self.pc + 1 if target is None else target
+        self.steps += 1
+
+    def run(self, max_steps: int) -> int:
+        """Execute until the end of the ROM image or until max_steps instructions ran, returns the amount executed."""
+        # this is the hot loop, it deliberately knows nothing about debugging (see Debugger)
+        program = self.program
+        end = len(program)
+        pc = self.pc
+        steps = 0
+        for steps in range(max_steps):
+            if not 0 <= pc < end:
+                break
+            handler, operands = program[pc]
+            target = handler(self, *operands)
+            pc = pc + 1 if target is None else target
+        else:
+            steps = max_steps
+        self.pc = pc
+        self.steps += steps
+        return steps
+
+    def run_until_halt(self, max_steps: int) -> "Halt":
+        """Execute like run, but stop as soon as the program provably loops forever (like the jump-to-self ending test programs)."""
+        # a program that revisits a line must take a jump to it or to before it, so the machine state is only compared
+        # at backward jumps, and only its hash is kept (a 64-bit collision mistaking two states is negligible)
+        program = self.program
+        end = len(program)
+        pc = self.pc
+        seen = set()
+        for steps in range(max_steps):
+            if not 0 <= pc < end:
+                halt = Halt("finished", pc, steps)
+                break
+            handler, operands = program[pc]
+            target = handler(self, *operands)
+            if target is None:
+                pc += 1
+                continue
+            if target == pc: # jumping to itself without changing anything, it'll stay here forever
+                halt = Halt("self jump", pc, steps + 1)
+                break
+            if target < pc:
+                state = hash((target, self.registers.tobytes(), self.ram.tobytes()))
+                if state in seen:
+                    halt = Halt("repeated state", target, steps + 1)
+                    pc = target
+                    break
+                seen.add(state)
+            pc = target
+        else:
+            halt = Halt("max steps", pc, max_steps)
+        self.pc = pc
+        self.steps += halt.steps
+        return halt
+
+
+class Halt(NamedTuple):
+    """Why and where execution ended."""
+
+    reason: str  # "self jump", "repeated state", "finished" or "max steps"
+    pc: int      # line the program halted at ("self jump"), the start of the repeating loop ("repeated state"), or the next line
+    steps: int   # instructions executed in this run, counting the instruction that closed the loop once
+
+
+class Stop(NamedTuple):
+    """Why the debugger stopped execution."""
+
+    reason: str               # "breakpoint", "watchpoint", "finished" or "max steps"
+    pc: int                   # line number of the next instruction to execute
+    steps: int                # instructions executed since the machine started
+    location: str | None = None  # watched register or RAM cell that changed
+    old: int | None = None       # its value before the change
+    new: int | None = None       # its value after the change
+
+
+Condition = Callable[[Machine], bool]
+
+class Debugger:
+    """Breakpoints on ROM lines and watchpoints on registers and RAM cells, optionally guarded by a condition."""
+
+    def __init__(self, machine: Machine):
+        self.machine = machine
+        self.breakpoints: dict[int, Condition | None] = {} # line number: condition
+        self.watchpoints: dict[str, Condition | None] = {} # "rgN" or "rmN": condition
+        self._resume_pc: int | None = None # line of the last breakpoint stop, which the next run executes instead of stopping at
+
+    def add_breakpoint(self, ln: int, condition: Condition | None = None) -> None:
+        """Stop before the instruction at a line runs (and the condition, if any, holds)."""
+        self.breakpoints[ln] = condition
+
+    def add_watchpoint(self, location: str, condition: Condition | None = None) -> None:
+        """Stop after a register or RAM cell changes value (and the condition, if any, holds)."""
+        if location[:2] not in ("rg", "rm") or not location[2:].isdigit() \
+            or int(location[2:]) >= (REGISTER_COUNT if location[:2] == "rg" else RAM_SIZE):
+            raise ValueError(f"Invalid watchpoint location: {location}")
+        self.watchpoints[location] = condition
+
+    def remove_breakpoint(self, ln: int) -> None:
+        self.breakpoints.pop(ln, None)
+
+    def remove_watchpoint(self, location: str) -> None:
+        self.watchpoints.pop(location, None)
+
+    def run(self, max_steps: int) -> Stop:
+        """Run until a breakpoint or watchpoint triggers, the ROM image ends, or max_steps instructions ran."""
+        machine = self.machine
+        resume_pc, self._resume_pc = self._resume_pc, None
+        if not self.breakpoints and not self.watchpoints:
+            # nothing to check, so the machine's own loop runs at full speed
+            machine.run(max_steps)
+            return Stop("finished" if machine.finished() else "max steps", machine.pc, machine.steps)
+
+        # only lines with a breakpoint or writing a watched location are checked, every other line just executes
+        watched_lines = {}
+        for ln, (operation, operands) in enumerate(machine.instructions):
+            locations = [location for location in written_locations(operation, operands) if location in self.watchpoints]
+            if locations:
+                watched_lines[ln] = locations
+        checked_lines = watched_lines.keys() | self.breakpoints.keys()
+
+        program = machine.program
+        end = len(program)
+        for _ in range(max_steps):
+            pc = machine.pc
+            if not 0 <= pc < end:
+                return Stop("finished", pc, machine.steps)
+            if pc not in checked_lines:
+                handler, operands = program[pc]
+                target = handler(machine, *operands)
+                machine.pc = pc + 1 if target is None else target
+                machine.steps += 1
+                resume_pc = None
+                continue
+
+            if pc in self.breakpoints and pc != resume_pc:
+                condition = self.breakpoints[pc]
+                if condition is None or condition(machine):
+                    self._resume_pc = pc
+                    return Stop("breakpoint", pc, machine.steps)
+            resume_pc = None # only the first instruction of a run can be the breakpoint it's resuming from
+
+            locations = watched_lines.get(pc, [])
+            before = [machine.read(location) for location in locations]
+            machine.step()
+            for location, old in zip(locations, before):
+                new = machine.read(location)
+                condition = self.watchpoints[location]
+                if new != old and (condition is None or condition(machine)):
+                    return Stop("watchpoint", machine.pc, machine.steps, location, old, new)
+        return Stop("finished" if machine.finished() else "max steps", machine.pc, machine.steps)
+
+
+def dump(machine: Machine) -> str:
+    """Describe the machine's nonzero registers and RAM cells."""
+    registers = " ".join(f"rg{i}={val}" for i, val in enumerate(machine.registers) if val)
+    ram = " ".join(f"rm{i}={val}" for i, val in enumerate(machine.ram) if val)
+    return f"pc={machine.pc} steps={machine.steps}\nregisters: {registers or 'all zero'}\nram: {ram or 'all zero'}"
+
+
+# some test cases for the debugger, run on the test program's ROM image: (breakpoints, watchpoints, expected stops as (reason, line))
+
+TEST_IMAGE = "../tests/machine_code_hex.txt"
+
+test_cases = [
+    ([0], [], [("breakpoint", 0), ("max steps", 26)]), # stops before the first instruction, then resumes past it
+    ([26], [], [("breakpoint", 26), ("breakpoint", 26)]), # the self jump hits the breakpoint again every time
+    ([1], ["rg0"], [("watchpoint", 1), ("breakpoint", 1), ("watchpoint", 26), ("max steps", 26)]), # line 0 sets rg0, _rcl_ clears it
+    ([12, 14], [], [("breakpoint", 12), ("breakpoint", 14), ("max steps", 26)]), # line 13 is jumped over
+]
+
+def run_test(rom: list[int], breakpoints: list[int], watchpoints: list[str], stops: int) -> list[tuple[str, int]]:
+    debugger = Debugger(Machine(rom))
+    for ln in breakpoints:
+        debugger.add_breakpoint(ln)
+    for location in watchpoints:
+        debugger.add_watchpoint(location)
+    return [(stop.reason, stop.pc) for stop in (debugger.run(1000) for _ in range(stops))]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Execute an assembled ROM image without Logisim.")
+    parser.add_argument("input", type=str, nargs="?", help="Input file containing the ROM image (v2.0 raw, like the assembler's output).")
+    parser.add_argument("-t", "--test", help="run the debugger's test cases on the test program instead", required=False, action="store_true")
+    parser.add_argument("-n", "--max-steps", type=int, help="maximum amount of instructions to execute (default is 100000)", default=100_000)
+    parser.add_argument("-b", "--breakpoint", type=int, action="append", default=[], help="line number to stop at (repeatable)")
+    parser.add_argument("-d", "--detect-halt", help="stop as soon as the program loops forever (ignores breakpoints and watchpoints)", required=False, action="store_true")
+    parser.add_argument("-w", "--watch", type=str, action="append", default=[], help="register (rgN) or RAM cell (rmN) to stop at when it changes (repeatable)")
+    args = vars(parser.parse_args())
+
+    if args["test"]:
+        print("Running test cases...")
+        rom = read_image(args["input"] or str(Path(__file__).parent / TEST_IMAGE))
+        failed = False
+        for i, (breakpoints, watchpoints, expected) in enumerate(test_cases):
+            actual = run_test(rom, breakpoints, watchpoints, len(expected))
+            if actual != expected:
+                failed = True
+                print(f"Failed case #{i}: breakpoints {breakpoints}, watchpoints {watchpoints}, stopped at {actual}, expected {expected}")
+        print(f"\nTest Results: Debugger working {'improperly 🫠' if failed else 'properly 😊'}")
+        raise SystemExit(1 if failed else 0)
+    if not args["input"]:
+        parser.error("the input ROM image is required")
+
+    machine = Machine(read_image(args["input"]))
+    if args["detect_halt"]:
+        halt = machine.run_until_halt(args["max_steps"])
+        print(f"Halted: {halt.reason} at line {halt.pc} after {halt.steps} steps\n{dump(machine)}")
+        raise SystemExit
+    debugger = Debugger(machine)
+    for ln in args["breakpoint"]:
+        debugger.add_breakpoint(ln)
+    for location in args["watch"]:
+        debugger.add_watchpoint(location)
+
+    while True:
+        stop = debugger.run(args["max_steps"] - machine.steps)
+        if stop.reason == "breakpoint":
+            print(f"Breakpoint at line {stop.pc} after {stop.steps} steps")
+        elif stop.reason == "watchpoint":
+            print(f"Watchpoint {stop.location} changed from {stop.old} to {stop.new}, next line {stop.pc} after {stop.steps} steps")
+        else:
+            break
+    print(f"\nStopped: {stop.reason}\n{dump(machine)}")
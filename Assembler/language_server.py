@@ -0,0 +1,277 @@
+from assembler import assemble_line, locate
+from bisect import bisect_left, insort
+import json
+import re
+import sys
+
+# language server (LSP over stdin/stdout) for the assembly language: diagnostics as you type, the machine code of a line on
+# hover, and go to definition from lnN to the line it jumps to, editors start it with `python language_server.py`
+#
+# every line is assembled on its own (line numbers are just positions in the file), so a document keeps the result of
+# assembling each of its lines and an edit only reassembles the lines it touched
+
+ERROR = 1 # LSP diagnostic severity
+
+# LSP counts characters in UTF-16 code units unless the client agrees to code points (utf-32), Python strings count code
+# points, so positions are converted whenever a line has characters outside the BMP (like an emoji in a comment)
+
+def to_code_points(line: str, units: int) -> int:
+    """The index into a line of a position given in UTF-16 code units."""
+    count = 0
+    for index, char in enumerate(line):
+        if count >= units:
+            return index
+        count += 2 if ord(char) > 0xFFFF else 1
+    return len(line)
+
+def to_utf16(line: str, index: int) -> int:
+    """The position in UTF-16 code units of an index into a line."""
+    return index + sum(ord(char) > 0xFFFF for char in line[:index])
+
+def diagnose(line: str, problems: tuple[tuple[str, int, str], ...]) -> list[tuple[int, int, str]]:
+    """Turn a line's problems into (start column, end column, message) diagnostics."""
+    diagnostics = []
+    for diagnostic in locate(line, 0, problems):
+        start = diagnostic.column - 1
+        if diagnostic.code == "no-operation":
+            diagnostics.append((0, len(line), "Line is invalid. Specified reason: no operation."))
+        elif diagnostic.code == "input-amount":
+            reason = diagnostic.reason()
+            diagnostics.append((start, len(line.rstrip()), reason[0].upper() + reason[1:]))
+        else:
+            diagnostics.append((start, start + len(diagnostic.operand), diagnostic.reason()))
+    return diagnostics
+
+
+class Document:
+    """An open assembly file, with every line's machine code and diagnostics."""
+
+    def __init__(self, text: str, encoding: str = "utf-16"):
+        self.encoding = encoding # how the client counts characters, "utf-16" or "utf-32"
+        self.lines = text.split("\n")
+        self.results = [self.check(line) for line in self.lines] # (machine code, diagnostics) per line
+        self.error_lines = [ln for ln, (_, diagnostics) in enumerate(self.results) if diagnostics] # sorted
+
+    @staticmethod
+    def check(line: str) -> tuple[str, list[tuple[int, int, str]]]:
+        code, problems = assemble_line(line)
+        return code, diagnose(line, problems)
+
+    def clamp(self, position: dict) -> tuple[int, int]:
+        """The (line, character) an LSP position refers to, positions past the end of a line or the document (allowed by
+        LSP) refer to the end of it."""
+        ln = position["line"]
+        if ln >= len(self.lines):
+            return len(self.lines) - 1, len(self.lines[-1])
+        return ln, min(self.index(ln, position["character"]), len(self.lines[ln]))
+
+    def index(self, ln: int, character: int) -> int:
+        """The index into a line of an LSP character offset."""
+        line = self.lines[ln]
+        return character if self.encoding == "utf-32" or line.isascii() else to_code_points(line, character)
+
+    def character(self, ln: int, index: int) -> int:
+        """The LSP character offset of an index into a line."""
+        line = self.lines[ln]
+        return index if self.encoding == "utf-32" or line.isascii() else to_utf16(line, index)
+
+    def edit(self, start: dict, end: dict, text: str) -> None:
+        """Replace the text between two LSP positions, reassembling only the lines that changed."""
+        (first, start_character), (last, end_character) = self.clamp(start), self.clamp(end)
+        prefix = self.lines[first][:start_character]
+        suffix = self.lines[last][end_character:]
+        new_lines = (prefix + text + suffix).split("\n")
+        self.lines[first:last + 1] = new_lines
+        self.results[first:last + 1] = [self.check(line) for line in new_lines]
+
+        # shift the lines with errors after the edit instead of rescanning the whole document
+        shift = len(new_lines) - (last - first + 1)
+        i = bisect_left(self.error_lines, first)
+        later = [ln + shift for ln in self.error_lines[i:] if ln > last]
+        self.error_lines[i:] = later
+        for ln in range(first, first + len(new_lines)):
+            if self.results[ln][1]:
+                insort(self.error_lines, ln)
+
+    def diagnostics(self) -> list[dict]:
+        diagnostics = []
+        for ln in self.error_lines:
+            if ln == len(self.lines) - 1 and not self.lines[ln].strip():
+                continue # the empty "line" after the file's last newline isn't assembled
+            for start, end, message in self.results[ln][1]:
+                start, end = self.character(ln, start), self.character(ln, end)
+                diagnostics.append({"range": {"start": {"line": ln, "character": start}, "end": {"line": ln, "character": end}},
+                    "severity": ERROR, "source": "assembler", "message": message})
+        return diagnostics
+
+    def hover(self, ln: int) -> str | None:
+        if not 0 <= ln < len(self.lines):
+            return None
+        code = self.results[ln][0]
+        if code == "ERROR":
+            return None
+        return f"line {ln}: `{code}` (`{int(code, 16):032b}`)"
+
+    def definition(self, ln: int, character: int) -> int | None:
+        """The line a lnN under the cursor refers to."""
+        if not 0 <= ln < len(self.lines):
+            return None
+        character = self.index(ln, character)
+        for match in re.finditer(r"\bln(\d+)\b", self.lines[ln]):
+            if match.start() <= character <= match.end() and int(match.group(1)) < len(self.lines):
+                return int(match.group(1))
+        return None
+
+
+class LanguageServer:
+    """Speaks the parts of the language server protocol the assembly language needs."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.documents: dict[str, Document] = {}
+        self.encoding = "utf-16" # the LSP default, until the client offers utf-32
+        self.running = True
+
+    def read_message(self) -> dict | None:
+        length = None
+        while True:
+            header = self.reader.readline()
+            if not header:
+                return None
+            header = header.strip()
+            if not header:
+                break
+            name, _, value = header.decode("ascii").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        return json.loads(self.reader.read(length))
+
+    def send(self, message: dict) -> None:
+        body = json.dumps({"jsonrpc": "2.0", **message}, separators=(",", ":")).encode("utf-8")
+        self.writer.write(f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body)
+        self.writer.flush()
+
+    def publish(self, uri: str) -> None:
+        self.send({"method": "textDocument/publishDiagnostics",
+            "params": {"uri": uri, "diagnostics": self.documents[uri].diagnostics()}})
+
+    def serve(self) -> None:
+        while self.running:
+            message = self.read_message()
+            if message is None:
+                break
+            method = message.get("method")
+            handler = getattr(self, "on_" + method.replace("/", "_").replace("$", "_"), None) if method else None
+            if handler is not None:
+                result = handler(message.get("params", {}))
+                if "id" in message:
+                    self.send({"id": message["id"], "result": result})
+            elif "id" in message:
+                self.send({"id": message["id"], "error": {"code": -32601, "message": f"Unsupported method: {method}"}})
+
+    def on_initialize(self, params: dict) -> dict:
+        if "utf-32" in params.get("capabilities", {}).get("general", {}).get("positionEncodings", []):
+            self.encoding = "utf-32"
+        return {"capabilities": {
+            "positionEncoding": self.encoding,
+            "textDocumentSync": {"openClose": True, "change": 2}, # incremental
+            "hoverProvider": True,
+            "definitionProvider": True,
+        }, "serverInfo": {"name": "assembler"}}
+
+    def on_shutdown(self, params: dict) -> None:
+        return None
+
+    def on_exit(self, params: dict) -> None:
+        self.running = False
+
+    def on_textDocument_didOpen(self, params: dict) -> None:
+        document = params["textDocument"]
+        self.documents[document["uri"]] = Document(document["text"], self.encoding)
+        self.publish(document["uri"])
+
+    def on_textDocument_didChange(self, params: dict) -> None:
+        uri = params["textDocument"]["uri"]
+        for change in params["contentChanges"]:
+            if "range" in change:
+                self.documents[uri].edit(change["range"]["start"], change["range"]["end"], change["text"])
+            else:
+                self.documents[uri] = Document(change["text"], self.encoding)
+        self.publish(uri)
+
+    def on_textDocument_didClose(self, params: dict) -> None:
+        uri = params["textDocument"]["uri"]
+        self.documents.pop(uri, None)
+        self.send({"method": "textDocument/publishDiagnostics", "params": {"uri": uri, "diagnostics": []}})
+
+    def on_textDocument_hover(self, params: dict) -> dict | None:
+        document = self.documents.get(params["textDocument"]["uri"])
+        text = document.hover(params["position"]["line"]) if document else None
+        return {"contents": {"kind": "markdown", "value": text}} if text else None
+
+    def on_textDocument_definition(self, params: dict) -> dict | None:
+        uri = params["textDocument"]["uri"]
+        document = self.documents.get(uri)
+        ln = document.definition(params["position"]["line"], params["position"]["character"]) if document else None
+        if ln is None:
+            return None
+        return {"uri": uri, "range": {"start": {"line": ln, "character": 0}, "end": {"line": ln, "character": 0}}}
+
+
+# some test cases for incremental edits: (document, edits as (start line, start character, end line, end character, text),
+# the document's text after them), after every edit the document also has to match one built from scratch from its text
+
+TEST_DOCUMENT = "_rst_ rg0 1\n_nat_ rg1\n_add_ rg0 rg0 rg16\n_jmp_ ln3 # 😊 loop\n_rcl_"
+
+test_cases = [
+    # typing at the end of a line makes it invalid
+    (TEST_DOCUMENT, [(0, 11, 0, 11, " rg2")], "_rst_ rg0 1 rg2\n_nat_ rg1\n_add_ rg0 rg0 rg16\n_jmp_ ln3 # 😊 loop\n_rcl_"),
+    # fixing a line, then deleting past the end of it
+    (TEST_DOCUMENT, [(1, 0, 1, 5, "_rcl_"), (1, 5, 1, 99, "")], "_rst_ rg0 1\n_rcl_\n_add_ rg0 rg0 rg16\n_jmp_ ln3 # 😊 loop\n_rcl_"),
+    # an edit past the end of the document appends
+    (TEST_DOCUMENT, [(9, 0, 9, 0, "\n_rcl_"), (7, 3, 8, 0, "\n_bad_")],
+        "_rst_ rg0 1\n_nat_ rg1\n_add_ rg0 rg0 rg16\n_jmp_ ln3 # 😊 loop\n_rcl_\n_rcl_\n_bad_"),
+    # deleting across lines shifts the later errors up
+    (TEST_DOCUMENT, [(0, 5, 2, 5, "")], "_rst_ rg0 rg0 rg16\n_jmp_ ln3 # 😊 loop\n_rcl_"),
+    # inserting lines shifts the later errors down
+    (TEST_DOCUMENT, [(0, 0, 0, 0, "_nat_\n\n_xor_ rg1\n")],
+        "_nat_\n\n_xor_ rg1\n_rst_ rg0 1\n_nat_ rg1\n_add_ rg0 rg0 rg16\n_jmp_ ln3 # 😊 loop\n_rcl_"),
+    # the emoji is two UTF-16 code units, so " loop" starts at 14
+    (TEST_DOCUMENT, [(3, 14, 3, 19, ""), (3, 14, 3, 14, " ln2"), (3, 6, 3, 9, "ln99")],
+        "_rst_ rg0 1\n_nat_ rg1\n_add_ rg0 rg0 rg16\n_jmp_ ln99 # 😊 ln2\n_rcl_"),
+    # until nothing is left
+    (TEST_DOCUMENT, [(2, 14, 2, 18, "rg1"), (1, 0, 3, 0, ""), (0, 0, 99, 0, "")], ""),
+]
+
+def run_test(text: str, edits: list[tuple[int, int, int, int, str]], expected: str) -> list[str]:
+    """Apply edits to a document, returns how it differs from what's expected and from a document built from scratch."""
+    document = Document(text)
+    failures = []
+    for start_line, start_character, end_line, end_character, new_text in edits:
+        document.edit({"line": start_line, "character": start_character}, {"line": end_line, "character": end_character}, new_text)
+        fresh = Document("\n".join(document.lines))
+        for name in ("lines", "results", "error_lines"):
+            if getattr(document, name) != getattr(fresh, name):
+                failures.append(f"{name} is {getattr(document, name)}, expected {getattr(fresh, name)}")
+    if "\n".join(document.lines) != expected:
+        failures.append(f"text is {chr(10).join(document.lines)!r}, expected {expected!r}")
+    return failures
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Language server for the assembly language, editors talk to it over stdin and stdout.")
+    parser.add_argument("-t", "--test", help="run the incremental editing test cases instead of serving", required=False, action="store_true")
+    args = vars(parser.parse_args())
+
+    if args["test"]:
+        print("Running test cases...")
+        failed = False
+        for i, (text, edits, expected) in enumerate(test_cases):
+            for failure in run_test(text, edits, expected):
+                failed = True
+                print(f"Failed case #{i}: {failure}")
+        print(f"\nTest Results: Language server working {'improperly 🫠' if failed else 'properly 😊'}")
+        raise SystemExit(1 if failed else 0)
+    LanguageServer(sys.stdin.buffer, sys.stdout.buffer).serve()
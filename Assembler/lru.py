@@ -0,0 +1,41 @@
+# size-bounded memoization with hit/miss statistics for the assembler and disassembler, functools.lru_cache would do
+# the same but importing functools (or typing) alone costs several times the CLIs' startup budget (see build_tables.py)
+
+class LRUCache:
+    """Memoizes a single-argument function, evicting the least recently used results beyond maxsize."""
+
+    def __init__(self, function, maxsize: int):
+        self.function = function # single-argument function to memoize
+        self.maxsize = maxsize
+        self.results = {} # dicts keep insertion order, so the first key is always the least recently used one
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, key):
+        results = self.results
+        try:
+            result = results.pop(key)
+            self.hits += 1
+        except KeyError:
+            result = self.function(key)
+            self.misses += 1
+            if len(results) >= self.maxsize > 0:
+                del results[next(iter(results))]
+        if self.maxsize > 0:
+            results[key] = result
+        return result
+
+    def resize(self, maxsize: int) -> None:
+        """Change the size bound, evicting the least recently used results that no longer fit."""
+        self.maxsize = maxsize
+        while len(self.results) > max(maxsize, 0):
+            del self.results[next(iter(self.results))]
+
+    def clear(self) -> None:
+        self.results.clear()
+        self.hits = self.misses = 0
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        return (f"{self.hits} hits, {self.misses} misses ({self.hits / total if total else 0:.0%} hit rate), "
+            f"{len(self.results)}/{self.maxsize} cached")
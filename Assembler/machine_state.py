@@ -0,0 +1,125 @@
+from array import array
+
+# compact model of everything the CPU remembers between clock cycles, small enough to keep millions of them around
+
+REGISTER_COUNT = 16
+RAM_SIZE = 256
+
+_ZERO_REGISTERS = array("h", bytes(2 * REGISTER_COUNT))
+_ZERO_RAM = array("h", bytes(2 * RAM_SIZE))
+
+def wrap(value: int) -> int:
+    """Wrap an integer to a signed 16-bit value, like the CPU's 16-bit registers do."""
+    return ((value + (1 << 15)) & ((1 << 16) - 1)) - (1 << 15)
+
+
+class MachineState:
+    """The CPU's 16 registers, 256 words of RAM, program counter and overflow flag."""
+
+    __slots__ = ("registers", "ram", "pc", "overflow")
+
+    registers: array  # signed 16-bit words, array("h") so out of range values raise instead of silently growing
+    ram: array        # signed 16-bit words
+    pc: int           # line number of the next instruction
+    overflow: bool    # whether the last _add_, _sub_ or _inv_ overflowed (what the circuit's OverflowChecker corrects for)
+
+    def __init__(self):
+        self.registers = array("h", _ZERO_REGISTERS)
+        self.ram = array("h", _ZERO_RAM)
+        self.pc = 0
+        self.overflow = False
+
+    def add(self, a: int, b: int, c: int) -> None:
+        """rg c = rg a + rg b, wrapping around like SixteenBitEfficientALU."""
+        result = self.registers[a] + self.registers[b]
+        self.registers[c] = wrapped = wrap(result)
+        self.overflow = wrapped != result
+
+    def sub(self, a: int, b: int, c: int) -> None:
+        """rg c = rg a - rg b, wrapping around like SixteenBitEfficientALU."""
+        result = self.registers[a] - self.registers[b]
+        self.registers[c] = wrapped = wrap(result)
+        self.overflow = wrapped != result
+
+    def inv(self, a: int, b: int) -> None:
+        """rg b = -rg a, the two's complement negation of -32768 is itself (and overflows) like SixteenBitNegator."""
+        result = -self.registers[a]
+        self.registers[b] = wrapped = wrap(result)
+        self.overflow = wrapped != result
+
+    def clear_registers(self) -> None:
+        self.registers[:] = _ZERO_REGISTERS
+
+    def read(self, location: str) -> int:
+        """Read a register ("rgN") or RAM cell ("rmN")."""
+        return (self.registers if location[:2] == "rg" else self.ram)[int(location[2:])]
+
+    def registers_view(self) -> memoryview:
+        """Zero-copy view of the registers, for bulk inspection."""
+        return memoryview(self.registers)
+
+    def ram_view(self) -> memoryview:
+        """Zero-copy view of the RAM, for bulk inspection."""
+        return memoryview(self.ram)
+
+    def key(self) -> bytes:
+        """Compact, hashable encoding of the whole state (for comparing states during state-space exploration)."""
+        # the line number register is 16 bits, a pc of 65536 (having run off the end of a full ROM) is line 0 to the hardware
+        return self.registers.tobytes() + self.ram.tobytes() + (self.pc & 0xFFFF).to_bytes(2, "little") + bytes((self.overflow,))
+
+    def copy(self) -> "MachineState":
+        state = MachineState.__new__(MachineState)
+        state.registers = array("h", self.registers)
+        state.ram = array("h", self.ram)
+        state.pc = self.pc
+        state.overflow = self.overflow
+        return state
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, MachineState) and self.key() == other.key()
+
+    def __hash__(self) -> int:
+        return hash(self.key())
+
+
+# some test cases for the 16-bit semantics: (operation, register values before, register values after, overflowed)
+
+test_cases = [
+    ("add", (1, 2), (1, 2, 3), False),
+    ("add", (32767, 1), (32767, 1, -32768), True),      # wraps around to the most negative value
+    ("add", (-32768, -1), (-32768, -1, 32767), True),
+    ("sub", (5, 7), (5, 7, -2), False),
+    ("sub", (-32768, 1), (-32768, 1, 32767), True),
+    ("sub", (0, -32768), (0, -32768, -32768), True),    # 0 - (-32768) is -32768 again
+    ("inv", (5,), (5, -5), False),
+    ("inv", (-32768,), (-32768, -32768), True),          # -(-32768) is itself, like SixteenBitNegator
+    ("inv", (32767,), (32767, -32767), False),
+]
+
+def run_test(operation: str, before: tuple[int, ...]) -> tuple[tuple[int, ...], bool]:
+    state = MachineState()
+    state.registers[:len(before)] = array("h", before)
+    getattr(state, operation)(*range(len(before) + 1))
+    return tuple(state.registers[:len(before) + 1]), state.overflow
+
+
+if __name__ == "__main__":
+    print("Running test cases...")
+    failed = False
+    for i, (operation, before, expected, overflow) in enumerate(test_cases):
+        actual = run_test(operation, before)
+        if actual != (expected, overflow):
+            failed = True
+            print(f"Failed case #{i}: {operation} {before} gave {actual}, expected {(expected, overflow)}")
+
+    # the overflow flag only reflects the last operation, and a pc past a full ROM image still has a key
+    state = MachineState()
+    state.registers[0] = 32767
+    state.add(0, 0, 1)
+    state.add(2, 2, 3)
+    state.pc = 65536
+    if state.overflow or len(state.key()) != len(MachineState().key()) or state.copy() != state:
+        failed = True
+        print("Failed case: overflow flag kept after a later operation, or a pc of 65536 has no key")
+    print(f"\nTest Results: Machine state working {'improperly 🫠' if failed else 'properly 😊'}")
+    raise SystemExit(1 if failed else 0)
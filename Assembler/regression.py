@@ -0,0 +1,127 @@
+import assembler
+from array import array
+from emulator import Machine, read_image
+from multiprocessing import Pool, shared_memory
+from pathlib import Path
+import json
+import time
+
+# runs every test suite (a directory like tests/) headlessly: the assembly source is assembled, compared against the
+# expected ROM image if there is one, executed until it halts, and its final RAM and registers are checked
+
+ASSEMBLY_FILE = "assembly.txt"           # assembly source of the test program
+IMAGE_FILE = "machine_code_hex.txt"      # expected ROM image (optional)
+EXPECTED_FILE = "expected.json"          # expected outcome of running the program
+
+DEFAULT_MAX_STEPS = 100_000
+
+def discover(root: Path) -> list[Path]:
+    """Find every test suite directory under root (including root itself)."""
+    return sorted(path.parent for path in root.rglob(EXPECTED_FILE) if (path.parent / ASSEMBLY_FILE).exists())
+
+def assemble_suite(suite: Path) -> dict:
+    """Assemble a suite's program and compare it to its expected ROM image."""
+    start = time.perf_counter()
+    with open(suite / ASSEMBLY_FILE, "r") as f:
+        assembly_code = f.readlines()
+    assembler.errors.clear() # the worker process is reused between suites
+    assembled_code = assembler.assemble(assembly_code)
+
+    failures = assembler.errors.messages()
+    words = [int(code, 16) for code in assembled_code if code != "ERROR"]
+    if (suite / IMAGE_FILE).exists() and not failures:
+        expected_words = read_image(suite / IMAGE_FILE)
+        if words != expected_words:
+            mismatches = [ln for ln, (word, expected) in enumerate(zip(words, expected_words)) if word != expected]
+            failures.append(f"assembled {len(words)} words, expected {len(expected_words)}, "
+                f"mismatched lines: {mismatches[:10]}")
+    return {"words": words, "failures": failures, "assemble_seconds": time.perf_counter() - start}
+
+
+_rom = None # every ROM image back to back, shared with the worker processes
+
+def _attach(shm_name: str) -> None:
+    """Attach a worker process to the shared ROM images."""
+    global _rom
+    shm = shared_memory.SharedMemory(name=shm_name) # the parent owns the block and unlinks it once every suite ran
+    _rom = (shm, shm.buf.cast("I"))
+
+def run_suite(suite: Path, offset: int, length: int) -> dict:
+    """Execute a suite's program from the shared ROM images and check its outcome."""
+    start = time.perf_counter()
+    with open(suite / EXPECTED_FILE, "r") as f:
+        expected = json.load(f)
+
+    machine = Machine(_rom[1][offset:offset + length].tolist())
+    halt = machine.run_until_halt(expected.get("max_steps", DEFAULT_MAX_STEPS))
+
+    failures = []
+    if halt.reason == "max steps" or halt.reason != expected.get("halt", halt.reason):
+        failures.append(f"halted with '{halt.reason}', expected '{expected.get('halt', 'a halt')}'")
+    for location, value in {**expected.get("ram", {}), **expected.get("registers", {})}.items():
+        actual = machine.read(location)
+        if actual != value:
+            failures.append(f"{location} is {actual}, expected {value}")
+    return {"failures": failures, "halt": halt.reason, "halt_line": halt.pc, "steps": halt.steps,
+        "run_seconds": time.perf_counter() - start}
+
+def run(suites: list[Path], processes: int | None = None) -> dict:
+    """Assemble and run every suite across a pool of processes, returning a machine-readable report."""
+    start = time.perf_counter()
+    with Pool(processes) as pool:
+        assembled = pool.map(assemble_suite, suites)
+
+    # decoded images go into one shared block instead of being pickled to every worker
+    offsets = []
+    total = 0
+    for result in assembled:
+        offsets.append(total)
+        total += len(result["words"])
+    shm = shared_memory.SharedMemory(create=True, size=max(total, 1) * 4)
+    try:
+        rom = shm.buf.cast("I")
+        for offset, result in zip(offsets, assembled):
+            rom[offset:offset + len(result["words"])] = array("I", result["words"])
+        rom.release()
+
+        # a program that didn't assemble isn't worth running
+        runnable = [(suite, offset, len(result["words"]))
+            for suite, offset, result in zip(suites, offsets, assembled) if not result["failures"]]
+        with Pool(processes, initializer=_attach, initargs=(shm.name,)) as pool:
+            executed = iter(pool.starmap(run_suite, runnable))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    tests = []
+    for suite, result in zip(suites, assembled):
+        test = {"name": str(suite), "assemble_seconds": result["assemble_seconds"], "failures": result["failures"]}
+        if not result["failures"]:
+            test |= next(executed)
+        test["passed"] = not test["failures"]
+        tests.append(test)
+    passed = sum(test["passed"] for test in tests)
+    return {"passed": passed, "failed": len(tests) - passed, "seconds": time.perf_counter() - start, "tests": tests}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Assemble and run every test suite, reporting which ones pass.")
+    parser.add_argument("root", type=str, nargs="?", help="directory to search for test suites (default is ../tests)",
+        default=str(Path(__file__).parent.parent / "tests"))
+    parser.add_argument("-j", "--jobs", type=int, help="amount of worker processes (default is one per CPU)", default=None)
+    parser.add_argument("-o", "--output", type=str, help="output file to write the JSON report to (default is stdout)", default=None)
+    args = vars(parser.parse_args())
+
+    report = run(discover(Path(args["root"])), args["jobs"])
+    if args["output"]:
+        with open(args["output"], "w+") as output:
+            json.dump(report, output, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+    for test in report["tests"]:
+        if not test["passed"]:
+            print(f"Failed suite {test['name']}: {'; '.join(test['failures'])}")
+    print(f"\nTest Results: {report['passed']} passed, {report['failed']} failed {'😊' if not report['failed'] else '🫠'}")
+    raise SystemExit(1 if report["failed"] else 0)
@@ -0,0 +1,9 @@
+# generated by build_tables.py from definitions.py, do not edit by hand
+
+INPUT_BOUNDS = {'rg': (0, 16), 'rm': (0, 256), 'ln': (0, 65536), 'intgr': (-32768, 32768), 'btwse': (None, None)}  # input kind: (min inclusive, max exclusive)
+
+ENCODE = {'_add_': ('0000', ('rg', 'rg', 'rg')), '_sub_': ('0001', ('rg', 'rg', 'rg')), '_grt_': ('0010', ('rg', 'rg', 'rg')), '_eql_': ('0011', ('rg', 'rg', 'rg')), '_jmp_': ('0100', ('ln',)), '_cjp_': ('1111', ('ln', 'rg', 'rg', 'btwse')), '_rst_': ('0101', ('rg', 'intgr')), '_rrd_': ('0110', ('rg', 'rg')), '_rcl_': ('0111', ()), '_and_': ('1000', ('rg', 'rg', 'rg')), '_bor_': ('1001', ('rg', 'rg', 'rg')), '_xor_': ('1010', ('rg', 'rg', 'rg')), '_not_': ('1011', ('rg', 'rg')), '_rld_': ('1100', ('rm', 'rg')), '_rms_': ('1101', ('rm', 'rg')), '_inv_': ('1110', ('rg', 'rg'))}  # operation: (binary opcode, input kinds)
+
+DECODE = {'0000': ('_add_', ('rg', 'rg', 'rg')), '0001': ('_sub_', ('rg', 'rg', 'rg')), '0010': ('_grt_', ('rg', 'rg', 'rg')), '0011': ('_eql_', ('rg', 'rg', 'rg')), '0100': ('_jmp_', ('ln',)), '1111': ('_cjp_', ('ln', 'rg', 'rg', 'btwse')), '0101': ('_rst_', ('rg', 'intgr')), '0110': ('_rrd_', ('rg', 'rg')), '0111': ('_rcl_', ()), '1000': ('_and_', ('rg', 'rg', 'rg')), '1001': ('_bor_', ('rg', 'rg', 'rg')), '1010': ('_xor_', ('rg', 'rg', 'rg')), '1011': ('_not_', ('rg', 'rg')), '1100': ('_rld_', ('rm', 'rg')), '1101': ('_rms_', ('rm', 'rg')), '1110': ('_inv_', ('rg', 'rg'))}  # binary opcode: (operation, input kinds)
+
+BITWISE_CMPS = {'_eql_': '0011', '_grt_': '0010'}  # comparisons usable by conditional jumps: binary opcode